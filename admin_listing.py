@@ -0,0 +1,146 @@
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.responses import Response, StreamingResponse
+from pymongo import ASCENDING
+
+from database import run_db
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+# Keyset (``_id``) pagination and NDJSON export for the admin listing endpoints.
+# Pages are fetched with ``_id > after`` sorted by ``_id`` so every page is an
+# index range scan, and exports walk the collection batch by batch so memory
+# stays flat regardless of collection size. Documents are serialized straight
+# from the driver's dicts by orjson (ObjectId via ``default``, datetime
+# natively), skipping FastAPI's jsonable_encoder and a per-document copy.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def _encode_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    """
+    Serialize Mongo documents to JSON bytes (ObjectId as str, datetime as ISO 8601)
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_encode_default)
+    return json.dumps(encode_value(content), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def dumps_lines(documents):
+    """
+    Serialize documents as newline-delimited JSON bytes
+    """
+    if orjson is not None:
+        return b"".join(
+            orjson.dumps(document, default=_encode_default, option=orjson.OPT_APPEND_NEWLINE)
+            for document in documents
+        )
+    return b"".join(dumps(document) + b"\n" for document in documents)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def build_projection(fields=None, exclude=()):
+    """
+    Turn a comma separated ``fields`` query parameter into a Mongo projection
+
+    Returns:
+        dict or None: projection document (``_id`` is always kept for paging)
+    """
+    selected = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    if selected:
+        # An empty projection means every field, so never let the excluded
+        # fields filter the selection down to nothing
+        return {field: 1 for field in selected if field not in exclude} or {"_id": 1}
+    if exclude:
+        return {field: 0 for field in exclude}
+    return None
+
+
+def parse_cursor(after):
+    """Raises ValueError unless ``after`` is an ``X-Next-Cursor`` value (an ObjectId)"""
+    if after is None:
+        return None
+    if not ObjectId.is_valid(after):
+        raise ValueError(f"Invalid cursor: {after!r}")
+    return ObjectId(after)
+
+
+def fetch_batch(collection, after, limit, projection):
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    cursor = collection.find(query, projection).sort("_id", ASCENDING).limit(limit)
+    return list(cursor)
+
+
+async def list_page(collection, limit, after=None, fields=None, exclude=()):
+    """
+    Return one page as a JSON list; the cursor for the next page is sent in the
+    ``X-Next-Cursor`` header (absent on the last page)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    projection = build_projection(fields, exclude)
+    documents = await run_db(fetch_batch, collection, parse_cursor(after), limit + 1, projection)
+
+    headers = {}
+    if len(documents) > limit:
+        documents = documents[:limit]
+        headers["X-Next-Cursor"] = str(documents[-1]["_id"])
+    return FastJSONResponse(content=documents, headers=headers)
+
+
+async def iter_ndjson(collection, projection, batch_size=EXPORT_BATCH_SIZE):
+    after = None
+    while True:
+        batch = await run_db(fetch_batch, collection, after, batch_size, projection)
+        if not batch:
+            break
+        yield dumps_lines(batch)
+        if len(batch) < batch_size:
+            break
+        after = batch[-1]["_id"]
+
+
+def export_ndjson(collection, fields=None, exclude=(), batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream the whole collection as newline-delimited JSON
+    """
+    return StreamingResponse(
+        iter_ndjson(collection, build_projection(fields, exclude), batch_size),
+        media_type="application/x-ndjson"
+    )
+
+
+async def list_collection(collection, limit, after=None, fields=None, format="json", exclude=()):
+    if format == "ndjson":
+        return export_ndjson(collection, fields, exclude)
+    return await list_page(collection, limit, after, fields, exclude)
@@ -0,0 +1,253 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+# Admission control for the LLM-backed endpoints. A request is admitted when
+#   1. its client (IP or user) has a token in its token bucket, and
+#   2. a slot in the global LLM work cap is free, or becomes free within
+#      ADMISSION_QUEUE_TIMEOUT while at most ADMISSION_MAX_QUEUE requests wait.
+# Otherwise it is rejected at once with 429 (rate limit) or 503 (overload)
+# and a Retry-After hint, instead of queueing unboundedly. Token buckets live
+# in process by default; ADMISSION_BACKEND=redis (REDIS_URL, requires the
+# optional ``redis`` package) shares them across workers and pods. The work
+# cap is always per process.
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, retry_after, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = "rate_limited" if status_code == 429 else "overloaded"
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets: ``rate`` tokens/s, up to ``burst`` per key.
+    Idle keys are evicted least recently used first beyond ``max_keys``.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def acquire(self, key):
+        """
+        Returns:
+            float: 0 when a token was taken, else seconds until one is available
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    async def close(self):
+        pass
+
+
+# KEYS[1] bucket, ARGV rate, burst. Uses the server clock so every client
+# agrees on time; returns the seconds to wait (0 when admitted) as a string.
+REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+
+class RedisTokenBucketLimiter:
+    """
+    Token buckets shared through Redis with one atomic script call per request.
+    Fails open: if Redis is unreachable the request is admitted.
+    """
+
+    def __init__(self, url, rate, burst, prefix="admission:"):
+        import redis.asyncio as redis
+
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(REDIS_TOKEN_BUCKET)
+
+    async def acquire(self, key):
+        try:
+            return float(await self.script(keys=[self.prefix + key], args=[self.rate, self.burst]))
+        except Exception as e:
+            print(f"Rate limiter backend error: {e}")
+            return 0.0
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ConcurrencyGate:
+    """
+    At most ``max_concurrent`` holders and ``max_queue`` waiters; waiters give
+    up after ``queue_timeout`` seconds
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        # Smoothed seconds a slot is held, for Retry-After estimates
+        self.avg_hold = 1.0
+
+    def _retry_after(self):
+        return self.avg_hold * (self.waiting + 1) / self.max_concurrent
+
+    async def acquire(self):
+        """
+        Returns:
+            float: acquisition time, to be passed to ``release``
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise AdmissionRejected(503, self._retry_after(), "Server is busy, please retry shortly")
+        self.waiting += 1
+        acquiring = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquiring), self.queue_timeout)
+        except BaseException as e:
+            # Timed out or the client went away: hand back a permit that may
+            # have been granted just as we gave up
+            acquiring.cancel()
+            acquiring.add_done_callback(lambda done: done.cancelled() or self._semaphore.release())
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected(503, self._retry_after(), "Server is busy, please retry shortly")
+            raise
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return time.monotonic()
+
+    def release(self, acquired_at):
+        self.active -= 1
+        self._semaphore.release()
+        self.avg_hold = 0.9 * self.avg_hold + 0.1 * (time.monotonic() - acquired_at)
+
+
+class AdmissionController:
+    def __init__(self, gate, limiter=None, key_by="ip", trust_forwarded=False):
+        self.gate = gate
+        self.limiter = limiter
+        self.key_by = key_by
+        self.trust_forwarded = trust_forwarded
+        self.rejected = {"rate_limited": 0, "overloaded": 0}
+
+    @classmethod
+    def from_env(cls):
+        limiter = None
+        if os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true":
+            rate = float(os.getenv("RATE_LIMIT_PER_SECOND", "1"))
+            burst = float(os.getenv("RATE_LIMIT_BURST", "10"))
+            if os.getenv("ADMISSION_BACKEND", "memory").lower() == "redis":
+                limiter = RedisTokenBucketLimiter(os.getenv("REDIS_URL", "redis://localhost:6379/0"), rate, burst)
+            else:
+                limiter = TokenBucketLimiter(rate, burst)
+        return cls(
+            ConcurrencyGate(
+                max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "32")),
+                max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+                queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+            ),
+            limiter=limiter,
+            key_by=os.getenv("RATE_LIMIT_KEY", "ip").lower(),
+            trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+        )
+
+    def client_key(self, request, user=None):
+        if self.key_by == "user" and user is not None:
+            return f"user:{user.userType}:{user.name}"
+        forwarded = request.headers.get("x-forwarded-for") if self.trust_forwarded else None
+        if forwarded:
+            return "ip:" + forwarded.split(",")[0].strip()
+        return "ip:" + (request.client.host if request.client else "unknown")
+
+    async def enter(self, request, user=None):
+        """
+        Admit one request or raise AdmissionRejected
+
+        Returns:
+            float: slot token to pass to ``leave``
+        """
+        await self.check_rate(request, user)
+        return await self.enter_work()
+
+    async def check_rate(self, request, user=None):
+        """Spend the client's token for one request, or raise AdmissionRejected (429)"""
+        if self.limiter is None:
+            return
+        retry_after = await self.limiter.acquire(self.client_key(request, user))
+        if retry_after > 0:
+            self.rejected["rate_limited"] += 1
+            raise AdmissionRejected(429, retry_after, "Too many requests, please slow down")
+
+    async def enter_work(self):
+        """
+        Take one slot of the work cap, without rate limiting; for each LLM
+        call a request fans out to (a batch) after ``check_rate``
+
+        Returns:
+            float: slot token to pass to ``leave``
+        """
+        try:
+            return await self.gate.acquire()
+        except AdmissionRejected as e:
+            self.rejected[e.reason] += 1
+            raise
+
+    def leave(self, slot):
+        self.gate.release(slot)
+
+    @asynccontextmanager
+    async def admit(self, request, user=None):
+        slot = await self.enter(request, user)
+        try:
+            yield
+        finally:
+            self.leave(slot)
+
+    def stats(self):
+        return {
+            "active": self.gate.active,
+            "waiting": self.gate.waiting,
+            "max_concurrent": self.gate.max_concurrent,
+            "max_queue": self.gate.max_queue,
+            "avg_hold_seconds": round(self.gate.avg_hold, 4),
+            "rate_limited_total": self.rejected["rate_limited"],
+            "overloaded_total": self.rejected["overloaded"]
+        }
+
+    async def close(self):
+        if self.limiter is not None:
+            await self.limiter.close()
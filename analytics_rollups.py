@@ -0,0 +1,258 @@
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from database import get_mongodb_connection
+
+# Materialized counters behind /api/admin/analytics/*. Every write path bumps
+# its bucket with an atomic $inc, so the dashboards read a handful of small
+# documents instead of aggregating whole collections:
+#   users:<user_type>:<YYYY-MM-DD>  -> count
+#   assessments:<dominant_trait>    -> count, answers_sum
+#   feedback                        -> scores.<key>.sum, scores.<key>.count
+# "python analytics_rollups.py rebuild" recomputes them from the raw
+# collections; "verify" compares the rollup reads with the raw pipelines.
+
+ROLLUP_COLLECTION = "analytics_rollups"
+
+
+def day_bucket(moment):
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def record_user_created(db, user_type, created_at, count=1):
+    day = day_bucket(created_at)
+    db[ROLLUP_COLLECTION].update_one(
+        {"_id": f"users:{user_type}:{day.date().isoformat()}"},
+        {"$inc": {"count": count}, "$setOnInsert": {"metric": "users", "user_type": user_type, "day": day}},
+        upsert=True
+    )
+
+
+def record_assessment(db, dominant_trait, answer_count, count=1):
+    db[ROLLUP_COLLECTION].update_one(
+        {"_id": f"assessments:{dominant_trait}"},
+        {"$inc": {"count": count, "answers_sum": answer_count},
+         "$setOnInsert": {"metric": "assessments", "dominant_trait": dominant_trait}},
+        upsert=True
+    )
+
+
+def record_users_created(db, users):
+    # Batch writes: one $inc per (user_type, day) bucket
+    buckets = Counter((user["user_type"], day_bucket(user["created_at"])) for user in users)
+    for (user_type, day), count in buckets.items():
+        record_user_created(db, user_type, day, count)
+
+
+def record_assessments(db, assessment_records):
+    totals = {}
+    for record in assessment_records:
+        count, answers = totals.get(record["dominant_trait"], (0, 0))
+        totals[record["dominant_trait"]] = (count + 1, answers + len(record["question_answers"]))
+    for dominant_trait, (count, answers) in totals.items():
+        record_assessment(db, dominant_trait, answers, count)
+
+
+def _is_field_name(key):
+    return bool(key) and "." not in key and not key.startswith("$")
+
+
+def record_feedback(db, feedback_scores):
+    record_feedbacks(db, [feedback_scores])
+
+
+def record_feedbacks(db, feedback_score_sets):
+    # One document for all keys keeps this to a single atomic update
+    increments = {}
+    for feedback_scores in feedback_score_sets:
+        for key, score in feedback_scores.items():
+            if _is_field_name(key):
+                increments[f"scores.{key}.sum"] = increments.get(f"scores.{key}.sum", 0) + score
+                increments[f"scores.{key}.count"] = increments.get(f"scores.{key}.count", 0) + 1
+    if increments:
+        db[ROLLUP_COLLECTION].update_one(
+            {"_id": "feedback"},
+            {"$inc": increments, "$setOnInsert": {"metric": "feedback"}},
+            upsert=True
+        )
+
+
+def read_user_analytics(db, now=None):
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=7)
+    cutoff_day = day_bucket(cutoff)
+
+    totals = {}
+    for bucket in db[ROLLUP_COLLECTION].find({"metric": "users"}):
+        row = totals.setdefault(bucket["user_type"], {"userType": bucket["user_type"], "total": 0, "lastWeek": 0})
+        row["total"] += bucket["count"]
+        if bucket["day"] > cutoff_day:
+            row["lastWeek"] += bucket["count"]
+
+    # Day buckets cannot split the day the 7-day window starts in, so count
+    # that partial day from the users collection (indexed on created_at)
+    for row in db.users.aggregate([
+        {"$match": {"created_at": {"$gte": cutoff, "$lt": cutoff_day + timedelta(days=1)}}},
+        {"$group": {"_id": "$user_type", "count": {"$sum": 1}}}
+    ]):
+        if row["_id"] in totals:
+            totals[row["_id"]]["lastWeek"] += row["count"]
+
+    return list(totals.values())
+
+
+def read_assessment_analytics(db):
+    buckets = db[ROLLUP_COLLECTION].find({"metric": "assessments"}).sort("count", -1).limit(5)
+    return [
+        {"_id": bucket["dominant_trait"], "count": bucket["count"],
+         "avg_answers": bucket["answers_sum"] / bucket["count"]}
+        for bucket in buckets
+    ]
+
+
+def read_feedback_analytics(db):
+    document = db[ROLLUP_COLLECTION].find_one({"_id": "feedback"}) or {}
+    return [
+        {"question": key, "average": round(bucket["sum"] / bucket["count"], 2),
+         "responses": bucket["count"]}
+        for key, bucket in document.get("scores", {}).items()
+    ]
+
+
+def raw_user_analytics(db, now=None):
+    now = now or datetime.utcnow()
+    return list(db.users.aggregate([
+        {"$group": {
+            "_id": "$user_type",
+            "count": {"$sum": 1},
+            "last_week": {
+                "$sum": {"$cond": [{"$gte": ["$created_at", now - timedelta(days=7)]}, 1, 0]}
+            }
+        }},
+        {"$project": {"userType": "$_id", "total": "$count", "lastWeek": "$last_week", "_id": 0}}
+    ]))
+
+
+def raw_feedback_analytics(db):
+    rows = db.feedback.aggregate([
+        {"$project": {"feedback_scores": {"$objectToArray": "$feedback_scores"}}},
+        {"$unwind": "$feedback_scores"},
+        {"$group": {
+            "_id": "$feedback_scores.k",
+            "avg": {"$avg": "$feedback_scores.v"},
+            "count": {"$sum": 1}
+        }}
+    ])
+    return [
+        {"question": row["_id"], "average": round(row["avg"], 2), "responses": row["count"]}
+        for row in rows if _is_field_name(row["_id"])
+    ]
+
+
+def rebuild_rollups(db):
+    """
+    Recompute every rollup from the raw collections into a scratch collection
+    and swap it in. Writes landing during the rebuild are not counted, so run
+    it when traffic is quiet.
+
+    Returns:
+        int: number of rollup documents written
+    """
+    documents = []
+    for row in db.users.aggregate([
+        {"$match": {"created_at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"user_type": "$user_type",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}},
+            "count": {"$sum": 1}
+        }}
+    ], allowDiskUse=True):
+        day = datetime.strptime(row["_id"]["day"], "%Y-%m-%d")
+        documents.append({"_id": f"users:{row['_id']['user_type']}:{row['_id']['day']}",
+                          "metric": "users", "user_type": row["_id"]["user_type"],
+                          "day": day, "count": row["count"]})
+
+    for row in db.assessments.aggregate([
+        {"$group": {
+            "_id": "$dominant_trait",
+            "count": {"$sum": 1},
+            "answers_sum": {"$sum": {"$size": "$question_answers"}}
+        }}
+    ], allowDiskUse=True):
+        documents.append({"_id": f"assessments:{row['_id']}", "metric": "assessments",
+                          "dominant_trait": row["_id"], "count": row["count"],
+                          "answers_sum": row["answers_sum"]})
+
+    scores = {}
+    for row in db.feedback.aggregate([
+        {"$project": {"feedback_scores": {"$objectToArray": "$feedback_scores"}}},
+        {"$unwind": "$feedback_scores"},
+        {"$group": {"_id": "$feedback_scores.k", "sum": {"$sum": "$feedback_scores.v"}, "count": {"$sum": 1}}}
+    ], allowDiskUse=True):
+        if _is_field_name(row["_id"]):
+            scores[row["_id"]] = {"sum": row["sum"], "count": row["count"]}
+    if scores:
+        documents.append({"_id": "feedback", "metric": "feedback", "scores": scores})
+
+    scratch = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    scratch.drop()
+    if documents:
+        scratch.insert_many(documents)
+        scratch.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        db[ROLLUP_COLLECTION].drop()
+    return len(documents)
+
+
+def _normalized(rows, key):
+    return sorted(
+        ({name: round(value, 6) if isinstance(value, float) else value for name, value in row.items()}
+         for row in rows),
+        key=lambda row: str(row[key])
+    )
+
+
+def verify_rollups(db):
+    """
+    Compare the rollup-backed analytics with the raw aggregation pipelines
+
+    Returns:
+        dict: metric name -> True when both sources agree
+    """
+    now = datetime.utcnow()
+    # The raw pipeline's top 5 is only well defined without ties at the cut
+    # off, so compare the full trait breakdown
+    raw_traits = list(db.assessments.aggregate([
+        {"$group": {"_id": "$dominant_trait", "count": {"$sum": 1},
+                    "avg_answers": {"$avg": {"$size": "$question_answers"}}}}
+    ]))
+    rollup_traits = [
+        {"_id": bucket["dominant_trait"], "count": bucket["count"],
+         "avg_answers": bucket["answers_sum"] / bucket["count"]}
+        for bucket in db[ROLLUP_COLLECTION].find({"metric": "assessments"})
+    ]
+    return {
+        "users": _normalized(read_user_analytics(db, now), "userType")
+                 == _normalized(raw_user_analytics(db, now), "userType"),
+        "assessments": _normalized(rollup_traits, "_id") == _normalized(raw_traits, "_id"),
+        "feedback": _normalized(read_feedback_analytics(db), "question")
+                    == _normalized(raw_feedback_analytics(db), "question"),
+    }
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup documents")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+
+    db = get_mongodb_connection()
+    if args.command == "rebuild":
+        print(f"Wrote {rebuild_rollups(db)} rollup documents")
+    results = verify_rollups(db)
+    for metric, matches in results.items():
+        print(f"{metric:<12} {'OK' if matches else 'MISMATCH'}")
+    raise SystemExit(0 if all(results.values()) else 1)
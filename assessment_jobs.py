@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, ReturnDocument
+
+from database import get_mongodb_connection, run_db
+from personality_processing import (
+    LLM_MODEL,
+    PROMPT_VERSION,
+    fallback_analysis,
+    fallback_usage,
+    generate_personality_result,
+    needs_regeneration
+)
+
+# Deferred generation for /submit-assessment?mode=async. The assessment is
+# inserted with status "pending" and job_available_at = now; the collection
+# itself is the queue. Workers claim the oldest available job with one
+# atomic find_one_and_update that sets status "processing" and pushes
+# job_available_at out by the lease, so a worker that dies mid-job simply
+# lets the lease run out and the job is claimed again. Completion unsets
+# job_available_at, which keeps the partial index on it to live jobs only.
+# A failed LLM call is retried with backoff up to JOB_MAX_ATTEMPTS times,
+# then the template fallback is stored and marked for regeneration.
+#
+# Workers run in the API process (JOB_WORKERS, default 2) and/or as a
+# separate process: python assessment_jobs.py --workers 8
+
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+ACTIVE_STATUSES = (PENDING, PROCESSING)
+
+
+def job_fields(now=None):
+    """Fields that turn a new assessment record into a queued job"""
+    now = now or datetime.utcnow()
+    return {"status": PENDING, "personality_result": None, "job_attempts": 0, "job_available_at": now}
+
+
+def claim_job(db, worker_id, lease):
+    now = datetime.utcnow()
+    return db.assessments.find_one_and_update(
+        {"job_available_at": {"$lte": now}},
+        {
+            "$set": {"status": PROCESSING, "job_worker": worker_id, "job_available_at": now + lease},
+            "$inc": {"job_attempts": 1}
+        },
+        sort=[("job_available_at", ASCENDING)],
+        projection={"question_answers": 1, "user_id": 1, "job_attempts": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def complete_job(db, job, worker_id, personality_result, llm_usage):
+    """
+    Store the result unless another worker took the job over after our lease expired
+
+    Returns:
+        dict: the user document (name only), or None when the job was not ours
+    """
+    fields = {"status": COMPLETED, "personality_result": personality_result,
+              "llm_usage": llm_usage, "completed_at": datetime.utcnow()}
+    if needs_regeneration(llm_usage):
+        fields["needs_regeneration"] = True
+    updated = db.assessments.update_one(
+        {"_id": job["_id"], "job_worker": worker_id, "status": PROCESSING},
+        {"$set": fields, "$unset": {"job_available_at": "", "job_error": ""}}
+    )
+    if not updated.modified_count:
+        return None
+    user_id = job["user_id"]
+    return db.users.find_one_and_update(
+        {
+            "_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id,
+            "latest_assessment.assessment_id": job["_id"]
+        },
+        {"$set": {"latest_assessment.personality_result": personality_result,
+                  "latest_assessment.status": COMPLETED}},
+        projection={"name": 1}
+    ) or {"_id": user_id}
+
+
+def retry_job(db, job, worker_id, error, delay):
+    db.assessments.update_one(
+        {"_id": job["_id"], "job_worker": worker_id, "status": PROCESSING},
+        {"$set": {"status": PENDING, "job_error": error,
+                  "job_available_at": datetime.utcnow() + timedelta(seconds=delay)}}
+    )
+
+
+def release_job(db, job, worker_id):
+    """Hand an unfinished job back at shutdown without spending an attempt"""
+    db.assessments.update_one(
+        {"_id": job["_id"], "job_worker": worker_id, "status": PROCESSING},
+        {"$set": {"status": PENDING, "job_available_at": datetime.utcnow()}, "$inc": {"job_attempts": -1}}
+    )
+
+
+def job_counts(db):
+    counts = {status: 0 for status in ACTIVE_STATUSES}
+    for row in db.assessments.aggregate([
+        {"$match": {"job_available_at": {"$exists": True}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+class JobWorkerPool:
+    def __init__(self, get_db, api_key, concurrency=2, cache=None, client=None, flight=None,
+                 poll_interval=1.0, lease=120.0, max_attempts=3, retry_backoff=5.0, on_completed=None):
+        self.get_db = get_db
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.cache = cache
+        self.client = client
+        self.flight = flight
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.on_completed = on_completed
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._wake = asyncio.Event()
+        self._tasks = []
+        self.completed = 0
+        self.retried = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, get_db, api_key, **kwargs):
+        return cls(
+            get_db, api_key,
+            concurrency=int(os.getenv("JOB_WORKERS", "2")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+            lease=float(os.getenv("JOB_LEASE", "120")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            retry_backoff=float(os.getenv("JOB_RETRY_BACKOFF", "5")),
+            **kwargs
+        )
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def notify(self):
+        """A job was just queued in this process; skip the rest of the poll wait"""
+        self._wake.set()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {"workers": len(self._tasks), "worker_id": self.worker_id, "completed": self.completed,
+                "retried": self.retried, "fallbacks": self.fallbacks}
+
+    async def _work(self):
+        while True:
+            try:
+                job = await run_db(claim_job, self.get_db(), self.worker_id, self.lease)
+            except Exception as e:
+                print(f"Job claim error: {e}")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.process(job)
+            except asyncio.CancelledError:
+                await run_db(release_job, self.get_db(), job, self.worker_id)
+                raise
+            except Exception as e:
+                # Storage trouble; the lease will expire and the job run again
+                print(f"Job {job['_id']} error: {e}")
+
+    async def process(self, job):
+        db = self.get_db()
+        usage = {}
+        try:
+            result = await generate_personality_result(
+                job["question_answers"], self.api_key, self.cache, self.client, self.flight, usage
+            )
+        except Exception as e:
+            if job["job_attempts"] < self.max_attempts:
+                self.retried += 1
+                delay = random.uniform(0.5, 1.0) * self.retry_backoff * 2 ** (job["job_attempts"] - 1)
+                await run_db(retry_job, db, job, self.worker_id, str(e), delay)
+                return
+            print(f"Job {job['_id']} failed {job['job_attempts']} times, storing fallback: {e}")
+            self.fallbacks += 1
+            result, usage = fallback_analysis(job["question_answers"]), fallback_usage("error")
+        user = await run_db(complete_job, db, job, self.worker_id, result, usage)
+        if user is not None:
+            self.completed += 1
+            if self.on_completed is not None:
+                self.on_completed(job, user)
+
+
+async def run_workers(concurrency):
+    from llm_client import close_llm_manager, start_llm_manager
+    from result_cache import build_result_cache
+    from single_flight import SingleFlight
+
+    db = get_mongodb_connection()
+    api_key = os.getenv("MISTRAL_API_KEY")
+    pool = JobWorkerPool.from_env(
+        lambda: db, api_key,
+        cache=build_result_cache(db, LLM_MODEL, PROMPT_VERSION),
+        client=start_llm_manager(api_key),
+        flight=SingleFlight()
+    )
+    pool.concurrency = concurrency or pool.concurrency
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    pool.start()
+    print(f"Assessment job worker {pool.worker_id} running {pool.concurrency} workers")
+    await stop.wait()
+    await pool.close()
+    await close_llm_manager()
+    print(f"Stopped after {pool.completed} jobs")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run assessment generation workers against the Mongo job queue")
+    parser.add_argument("--workers", type=int, help="Concurrent jobs (default JOB_WORKERS)")
+    args = parser.parse_args()
+    asyncio.run(run_workers(args.workers))
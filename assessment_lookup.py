@@ -0,0 +1,81 @@
+from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
+
+# /get-assessment reads a denormalized copy of each user's latest assessment
+# kept on the user document, so a lookup is a single indexed find_one on
+# users (by _id or by name) instead of up to three sequential queries.
+
+LATEST_FIELDS = ("personality_result", "question_answers", "image_answers", "assessment_date", "status")
+
+
+def latest_assessment_summary(assessment_record):
+    summary = {field: assessment_record.get(field) for field in LATEST_FIELDS}
+    summary["assessment_id"] = assessment_record.get("_id")
+    return summary
+
+
+def latest_assessment_update(user_id, assessment_record):
+    """
+    Build the (filter, update) pair that points the user at ``assessment_record``
+    unless a newer one is already stored
+    """
+    summary = latest_assessment_summary(assessment_record)
+    return (
+        {
+            "_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id,
+            "$or": [
+                {"latest_assessment": {"$exists": False}},
+                {"latest_assessment.assessment_date": {"$lte": summary["assessment_date"]}}
+            ]
+        },
+        {"$set": {"latest_assessment": summary}}
+    )
+
+
+def set_latest_assessment(db, user_id, assessment_record):
+    db.users.update_one(*latest_assessment_update(user_id, assessment_record))
+
+
+def set_latest_assessments(db, assessment_records):
+    newest = {}
+    for record in assessment_records:
+        current = newest.get(record["user_id"])
+        if current is None or record["assessment_date"] >= current["assessment_date"]:
+            newest[record["user_id"]] = record
+    if newest:
+        db.users.bulk_write([
+            UpdateOne(*latest_assessment_update(user_id, record))
+            for user_id, record in newest.items()
+        ], ordered=False)
+
+
+def _find_user(db, identifier):
+    projection = {"latest_assessment": 1}
+    if ObjectId.is_valid(identifier):
+        user = db.users.find_one({"_id": ObjectId(identifier)}, projection)
+        if user:
+            return user
+    return db.users.find_one({"name": identifier}, projection, sort=[("created_at", DESCENDING)])
+
+
+def find_latest_assessment(db, identifier):
+    """
+    Resolve ``identifier`` (user id or name) to the user's latest assessment
+
+    Returns:
+        dict or None: the latest assessment fields, None when nothing matches
+    """
+    user = _find_user(db, identifier)
+    if user and user.get("latest_assessment"):
+        return user["latest_assessment"]
+
+    # Users created before the pointer existed: read assessments directly and
+    # backfill the pointer so the next lookup is a single query
+    user_id = str(user["_id"]) if user else identifier
+    assessment = db.assessments.find_one(
+        {"user_id": user_id},
+        sort=[("assessment_date", DESCENDING)]
+    )
+    if assessment and user:
+        set_latest_assessment(db, user_id, assessment)
+    return latest_assessment_summary(assessment) if assessment else None
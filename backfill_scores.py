@@ -0,0 +1,139 @@
+import argparse
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, UpdateOne
+
+load_dotenv()
+
+from database import get_mongodb_connection
+from personality_processing import TRAIT_SCORER
+from trait_scoring import SCORING_VERSION
+
+# Online backfill of dominant_trait and trait_scores for stored assessments.
+# Walks db.assessments in _id order, scores each batch with the NumPy engine
+# and writes it back with one unordered bulk_write. The last _id written is
+# checkpointed in the backfill_checkpoints collection, so an interrupted run
+# (or a rerun after new data) resumes where it stopped. --rate caps documents
+# per second to keep the extra load on a live cluster predictable.
+
+CHECKPOINT_COLLECTION = "backfill_checkpoints"
+CHECKPOINT_ID = "trait_scores"
+
+
+def load_checkpoint(db):
+    checkpoint = db[CHECKPOINT_COLLECTION].find_one({"_id": CHECKPOINT_ID}) or {}
+    return checkpoint.get("last_id"), checkpoint.get("processed", 0)
+
+
+def save_checkpoint(db, last_id, processed):
+    db[CHECKPOINT_COLLECTION].update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"last_id": last_id, "processed": processed, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def build_updates(documents, scorer=TRAIT_SCORER):
+    """
+    Score a batch of assessment documents
+
+    Returns:
+        tuple: (list of UpdateOne, number of documents skipped as unscorable)
+    """
+    scorable = [document for document in documents if scorer.is_valid(document.get("question_answers") or [])]
+    if not scorable:
+        return [], len(documents)
+    scores = scorer.score(scorer.encode([document["question_answers"] for document in scorable]))
+    updates = [
+        UpdateOne({"_id": document["_id"]}, {"$set": scorer.document_fields(scores, row)})
+        for row, document in enumerate(scorable)
+    ]
+    return updates, len(documents) - len(scorable)
+
+
+def backfill(db, batch_size=1000, rate=0.0, only_missing=True, restart=False,
+             progress_every=10, limit=None):
+    """
+    Score and write back every assessment after the checkpoint
+
+    Returns:
+        dict: processed (including earlier runs), updated and skipped counts
+        plus elapsed seconds
+    """
+    last_id, processed = (None, 0) if restart else load_checkpoint(db)
+    query = {}
+    if only_missing:
+        query["trait_scores.version"] = {"$ne": SCORING_VERSION}
+    updated = skipped = batches = run_processed = 0
+    started = time.monotonic()
+
+    while limit is None or run_processed < limit:
+        page = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        documents = list(
+            db.assessments.find(page, {"question_answers": 1}).sort("_id", ASCENDING).limit(batch_size)
+        )
+        if not documents:
+            break
+
+        updates, batch_skipped = build_updates(documents)
+        if updates:
+            updated += db.assessments.bulk_write(updates, ordered=False).modified_count
+        skipped += batch_skipped
+        processed += len(documents)
+        run_processed += len(documents)
+        last_id = documents[-1]["_id"]
+        save_checkpoint(db, last_id, processed)
+        batches += 1
+
+        elapsed = time.monotonic() - started
+        if progress_every and batches % progress_every == 0:
+            print(f"{processed} processed, {updated} updated, {skipped} skipped, "
+                  f"{run_processed / max(elapsed, 1e-9):.0f} docs/s, last _id {last_id}")
+
+        # Throttle: stay at or below ``rate`` documents per second overall
+        if rate > 0:
+            delay = run_processed / rate - elapsed
+            if delay > 0:
+                time.sleep(delay)
+
+    return {
+        "processed": processed,
+        "updated": updated,
+        "skipped": skipped,
+        "elapsed_s": round(time.monotonic() - started, 2)
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill trait scores on stored assessments")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Maximum documents per second (0 = unthrottled)")
+    parser.add_argument("--all", action="store_true",
+                        help="Rescore documents already scored by the current engine")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the saved checkpoint and start from the first _id")
+    parser.add_argument("--progress-every", type=int, default=10,
+                        help="Print progress every N batches")
+    parser.add_argument("--limit", type=int, help="Stop after this many documents")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = backfill(
+        get_mongodb_connection(),
+        batch_size=args.batch_size,
+        rate=args.rate,
+        only_missing=not args.all,
+        restart=args.restart,
+        progress_every=args.progress_every,
+        limit=args.limit
+    )
+    print(f"Done: {summary['processed']} processed, {summary['updated']} updated, "
+          f"{summary['skipped']} skipped in {summary['elapsed_s']}s")
+    if summary["updated"]:
+        print("Run 'python analytics_rollups.py rebuild' and 'python range_analytics.py clear --source assessments' "
+              "so the trait rollups and cached range buckets match the new dominant_trait values")
@@ -0,0 +1,922 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Run the API in-process against mongomock and the fake LLM so benchmarks
+# need neither a MongoDB server nor a Mistral API key. The "suite" scenario
+# drives every endpoint through a fake Mistral HTTP server instead; write its
+# JSON with --output and pass an earlier report to --compare to spot
+# regressions between commits.
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+import httpx
+import mongomock
+import uvicorn
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+import admin_listing
+import main
+import metrics
+from admission import AdmissionController, ConcurrencyGate
+from analytics_rollups import ROLLUP_COLLECTION
+from assessment_jobs import JobWorkerPool, job_counts
+from fake_llm import FAKE_ANALYSIS, FakeMistral, create_fake_mistral_app
+from indexes import ensure_indexes
+import personality_processing
+from personality_processing import PersonalityAssessment
+from prompts import PROMPT_TEMPLATES
+from range_analytics import BUCKET_COLLECTION, bucket_start, iter_csv
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0
+    }
+
+
+def fresh_db():
+    db = mongomock.MongoClient()["benchmark"]
+    ensure_indexes(db)
+    return db
+
+
+def reset_state():
+    """Point the app at an empty database and drop every in-process cache"""
+    main.db = fresh_db()
+    if main.result_cache is not None:
+        main.result_cache.memory.clear()
+    main.assessment_cache.clear()
+    main.hot_users.clear()
+
+
+def sample_submission(index):
+    # Distinct answer combination per index (base-4 digits) so caches stay cold
+    options = ["A", "B", "C", "D"]
+    return {
+        "user": {"name": f"Bench User {index}", "userType": "Student", "rollNumber": str(index)},
+        "questionAnswers": [options[(index >> (2 * q)) % 4] for q in range(6)],
+        "imageAnswers": []
+    }
+
+
+async def run_load(client, make_request, concurrency, total):
+    """
+    Issue ``total`` requests with at most ``concurrency`` in flight
+
+    Returns:
+        tuple: (latencies in seconds, wall-clock seconds, error count)
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            start = time.perf_counter()
+            response = await make_request(client, index)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, errors
+
+
+async def probe_health(client, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def bench_submit(args):
+    async def submit(client, index):
+        return await client.post("/submit-assessment", json=sample_submission(index))
+
+    results = []
+    main.db = fresh_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in args.concurrency:
+            reset_state()
+            health_samples = []
+            stop = asyncio.Event()
+            prober = asyncio.create_task(probe_health(client, stop, health_samples))
+            latencies, elapsed, errors = await run_load(
+                client, submit, concurrency, concurrency * args.rounds
+            )
+            stop.set()
+            await prober
+            result = {"scenario": "submit", "concurrency": concurrency, "errors": errors}
+            result.update(summarize(latencies, elapsed))
+            result["health_max_ms"] = round(max(health_samples, default=0.0) * 1000, 2)
+            results.append(result)
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def serve_app(app):
+    """
+    Serve ``app`` with uvicorn on a free local port inside the running loop.
+
+    Needed for streaming scenarios: httpx's ASGITransport buffers whole bodies.
+    """
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def bench_stream(args):
+    """
+    Measure time to first token over SSE. Every ``--disconnect-every``-th client
+    hangs up after its first token; each assessment must still be stored.
+    """
+    async def stream(client, index):
+        start = time.perf_counter()
+        first_token = None
+        async with client.stream("POST", "/submit-assessment/stream", json=sample_submission(index)) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: token") and first_token is None:
+                    first_token = time.perf_counter() - start
+                    if args.disconnect_every and index % args.disconnect_every == 0:
+                        break
+                elif line.startswith("event: error"):
+                    response.status_code = 599
+        ttfb.append(first_token if first_token is not None else time.perf_counter() - start)
+        return response
+
+    results = []
+    main.db = fresh_db()
+    async with serve_app(main.app) as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        for concurrency in args.concurrency:
+            reset_state()
+            ttfb = []
+            total = concurrency * args.rounds
+            latencies, elapsed, errors = await run_load(client, stream, concurrency, total)
+            await asyncio.gather(*main.background_tasks, return_exceptions=True)
+            result = {"scenario": "stream", "concurrency": concurrency, "errors": errors}
+            result.update(summarize(latencies, elapsed))
+            result["ttfb_p50_ms"] = round(percentile(ttfb, 50) * 1000, 2)
+            result["ttfb_p99_ms"] = round(percentile(ttfb, 99) * 1000, 2)
+            result["stored_assessments"] = main.db.assessments.count_documents({})
+            result["disconnected"] = len(range(0, total, args.disconnect_every)) if args.disconnect_every else 0
+            result["all_stored"] = result["stored_assessments"] == total
+            results.append(result)
+    return results
+
+
+async def bench_same_user(args):
+    """
+    Fire many simultaneous first submissions for one user and check that
+    exactly one user document is created (coalesced, idempotent upsert).
+    """
+    async def submit(client, index):
+        submission = sample_submission(index)
+        submission["user"] = {"name": "Concurrent User", "userType": "student", "rollNumber": "42"}
+        return await client.post("/submit-assessment", json=submission)
+
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    main.db = fresh_db()
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in args.concurrency:
+            reset_state()
+            total = concurrency * args.rounds
+            latencies, elapsed, errors = await run_load(client, submit, total, total)
+            users = main.db.users.count_documents({"name": "Concurrent User", "user_type": "student"})
+            rollup = main.db[ROLLUP_COLLECTION].find_one({"metric": "users", "user_type": "student"}) or {}
+            result = {"scenario": "same-user", "concurrency": total, "errors": errors,
+                      "user_documents": users, "rollup_count": rollup.get("count", 0),
+                      "ok": users == 1 and rollup.get("count") == 1 and errors == 0}
+            result.update(summarize(latencies, elapsed))
+            results.append(result)
+    return results
+
+
+def sample_feedback(index):
+    return {
+        "feedbackScores": {"clarity": index % 5 + 1, "relevance": (index // 5) % 5 + 1},
+        "additionalComments": f"Benchmark feedback {index}"
+    }
+
+
+SUITE_READS = {
+    "admin_listing": ["/api/admin/users?limit=100", "/api/admin/assessments?limit=100",
+                      "/api/admin/feedbacks?limit=100"],
+    "analytics": ["/api/admin/analytics/users", "/api/admin/analytics/assessments",
+                  "/api/admin/analytics/feedback"],
+}
+
+
+async def bench_suite(args):
+    """
+    End-to-end run against a fake Mistral HTTP server (real client, pooling
+    and retries) and mongomock. At each concurrency level the database starts
+    empty; submissions seed it, then every read endpoint is driven in turn.
+    """
+    async def submit(client, index):
+        return await client.post("/submit-assessment", json=sample_submission(index))
+
+    async def feedback(client, index):
+        return await client.post("/submit-feedback", json=sample_feedback(index))
+
+    def reads(paths):
+        async def read(client, index):
+            return await client.get(paths[index % len(paths)])
+        return read
+
+    results = []
+    fake_llm = create_fake_mistral_app(args.llm_latency, args.llm_token_rate, args.llm_error_rate)
+    async with serve_app(fake_llm) as llm_url:
+        os.environ["LLM_PROVIDER"] = "mistral"
+        os.environ["MISTRAL_SERVER_URL"] = llm_url
+        main.db = fresh_db()
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app), \
+                httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for concurrency in args.concurrency:
+                reset_state()
+                total = concurrency * args.rounds
+                seeded = [sample_submission(index)["user"]["name"] for index in range(total)]
+                phases = [
+                    ("submit_assessment", submit),
+                    ("submit_feedback", feedback),
+                    ("get_assessment", reads([f"/get-assessment/{name}" for name in seeded])),
+                    ("admin_listing", reads(SUITE_READS["admin_listing"])),
+                    ("analytics", reads(SUITE_READS["analytics"])),
+                ]
+                llm_calls = fake_llm.state.stats["calls"]
+                for endpoint, make_request in phases:
+                    latencies, elapsed, errors = await run_load(client, make_request, concurrency, total)
+                    result = {"scenario": "suite", "endpoint": endpoint, "concurrency": concurrency,
+                              "errors": errors}
+                    result.update(summarize(latencies, elapsed))
+                    if endpoint == "submit_assessment":
+                        result["llm_calls"] = fake_llm.state.stats["calls"] - llm_calls
+                    results.append(result)
+    return results
+
+
+async def run_open_loop(client, make_request, rate, total):
+    """
+    Start ``total`` requests at a fixed arrival rate regardless of how many
+    are still in flight, the way independent clients overload a server
+
+    Returns:
+        list: (latency in seconds, status code) per request
+    """
+    async def timed(index):
+        start = time.perf_counter()
+        response = await make_request(client, index)
+        return time.perf_counter() - start, response.status_code
+
+    tasks = []
+    started = time.perf_counter()
+    for index in range(total):
+        delay = started + index / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed(index)))
+    return await asyncio.gather(*tasks)
+
+
+async def bench_overload(args):
+    """
+    Offer more submissions per second than the LLM can serve (LLM_MAX_CONCURRENCY
+    slots of --llm-latency each), once with admission control off and once
+    with a small work cap and queue. Admitted latency should stay flat while
+    the excess is rejected quickly with 429/503.
+    """
+    async def submit(client, index):
+        return await client.post("/submit-assessment", json=sample_submission(index))
+
+    modes = {
+        "unbounded": lambda: None,
+        "admission": lambda: AdmissionController(ConcurrencyGate(
+            args.admission_concurrent, args.admission_queue, args.admission_timeout
+        )),
+    }
+    results = []
+    main.db = fresh_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for rate in args.concurrency:
+            for mode, build in modes.items():
+                reset_state()
+                main.admission = build()
+                total = int(rate * args.rounds)
+                start = time.perf_counter()
+                outcomes = await run_open_loop(client, submit, rate, total)
+                elapsed = time.perf_counter() - start
+                admitted = [latency for latency, status in outcomes if status == 200]
+                rejected = [latency for latency, status in outcomes if status in (429, 503)]
+                result = {"scenario": "overload", "endpoint": mode, "concurrency": rate,
+                          "offered_rps": rate, "admitted": len(admitted),
+                          "rejected_429": sum(1 for _, status in outcomes if status == 429),
+                          "rejected_503": sum(1 for _, status in outcomes if status == 503),
+                          "errors": len(outcomes) - len(admitted) - len(rejected),
+                          "reject_p99_ms": round(percentile(rejected, 99) * 1000, 2)}
+                result.update(summarize(admitted, elapsed))
+                results.append(result)
+        main.admission = None
+    return results
+
+
+async def bench_fallback(args):
+    """
+    Submit against a flaky fake LLM (--llm-error-rate, default 0.3 here):
+    retries and backoff give it a long latency tail. Compare no latency
+    budget with --llm-budget, then regenerate the fallback answers.
+    """
+    async def submit(client, index):
+        return await client.post("/submit-assessment", json=sample_submission(index))
+
+    error_rate = args.llm_error_rate or 0.3
+    results = []
+    main.db = fresh_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        fake = main.get_llm_manager().client
+        for concurrency in args.concurrency:
+            for mode, budget in (("no-budget", 0.0), ("budget", args.llm_budget)):
+                reset_state()
+                fake.chat.error_rate = error_rate
+                main.get_llm_manager().breaker.failures = 0
+                personality_processing.LLM_LATENCY_BUDGET = budget
+                latencies, elapsed, errors = await run_load(
+                    client, submit, concurrency, concurrency * args.rounds
+                )
+                await asyncio.gather(*personality_processing.late_generations, return_exceptions=True)
+                result = {"scenario": "fallback", "endpoint": mode, "concurrency": concurrency,
+                          "budget_s": budget, "errors": errors,
+                          "fallbacks": main.db.assessments.count_documents({"needs_regeneration": True}),
+                          "error_strings_stored": main.db.assessments.count_documents(
+                              {"personality_result": {"$regex": "^Error processing"}})}
+                result.update(summarize(latencies, elapsed))
+                # Provider recovered: swap the fallback texts for LLM ones
+                fake.chat.error_rate = 0.0
+                start = time.perf_counter()
+                regenerated = await main.regenerate_pending(
+                    main.db, "benchmark", cache=main.result_cache, client=main.get_llm_manager(),
+                    limit=result["fallbacks"]
+                )
+                result["regenerated"] = len(regenerated)
+                result["regeneration_s"] = round(time.perf_counter() - start, 3)
+                results.append(result)
+        results.append(await bench_half_open_hedge(client, fake.chat, args.llm_budget))
+    return results
+
+
+async def bench_half_open_hedge(client, chat, budget):
+    """
+    The streaming first-token hedge cancels the half-open trial call; the
+    breaker must open again (not stay stuck) and close on the next trial.
+    """
+    async def stream(index):
+        async with client.stream("POST", "/submit-assessment/stream", json=sample_submission(index)) as response:
+            return await response.aread()
+
+    def half_open():
+        breaker.record_failure()
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+    breaker = main.get_llm_manager().breaker
+    latency = chat.latency
+    reset_state()
+    chat.error_rate = 0.0
+    main.LLM_LATENCY_BUDGET = budget
+    try:
+        chat.latency = budget * 2
+        for _ in range(breaker.failure_threshold):
+            half_open()
+        await stream(0)
+        trial_released = not breaker._trial_in_flight
+        state_after_cancel = breaker.state
+        chat.latency = latency
+        half_open()
+        await stream(1)
+    finally:
+        chat.latency = latency
+        main.LLM_LATENCY_BUDGET = personality_processing.LLM_LATENCY_BUDGET
+    sources = [document["llm_usage"]["source"] for document in main.db.assessments.find().sort("_id", 1)]
+    return {"scenario": "fallback", "endpoint": "stream-hedge-half-open", "concurrency": 1,
+            "budget_s": budget, "errors": int(not trial_released or breaker.state != breaker.CLOSED),
+            "trial_released": trial_released, "state_after_cancel": state_after_cancel,
+            "state_after_recovery": breaker.state, "sources": sources}
+
+
+async def bench_jobs(args):
+    """
+    Submit with ?mode=async and time both the request and the wait until the
+    queue is drained, for each worker pool size in --workers. Submission
+    latency should not depend on the LLM; drain throughput should grow with
+    the pool.
+    """
+    async def submit(client, index):
+        return await client.post("/submit-assessment?mode=async", json=sample_submission(index))
+
+    results = []
+    main.db = fresh_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await main.job_pool.close()
+        for workers in args.workers:
+            for concurrency in args.concurrency:
+                reset_state()
+                main.job_pool = JobWorkerPool(
+                    lambda: main.db, "benchmark", concurrency=workers, cache=main.result_cache,
+                    client=main.get_llm_manager(), flight=main.llm_flights,
+                    poll_interval=0.05, on_completed=main.on_job_completed
+                )
+                main.job_pool.start()
+                total = concurrency * args.rounds
+                start = time.perf_counter()
+                latencies, elapsed, errors = await run_load(client, submit, concurrency, total)
+                while any(job_counts(main.db).values()):
+                    await asyncio.sleep(0.02)
+                drained = time.perf_counter() - start
+                await main.job_pool.close()
+                completed = main.db.assessments.count_documents({"status": "completed"})
+                result = {"scenario": "jobs", "endpoint": f"workers={workers}", "concurrency": concurrency,
+                          "workers": workers, "errors": errors, "completed": completed,
+                          "drain_s": round(drained, 3), "jobs_per_s": round(completed / drained, 2)}
+                result.update(summarize(latencies, elapsed))
+                results.append(result)
+    return results
+
+
+async def bench_prompts(args):
+    """
+    Run distinct answer sets through every prompt version against the
+    in-process stub and report tokens, cost and latency per version. Token
+    counts are the stub's len/4 estimate, and the stub always answers with
+    the same text, so only the prompt side (and any max_tokens cut) differs.
+    """
+    # Prompt length only costs time if the stub charges for prefill
+    fake = FakeMistral(latency=args.llm_latency, prefill_rate=args.llm_prefill_rate or 2000.0)
+    results = []
+    for concurrency in args.concurrency:
+        for version in sorted(PROMPT_TEMPLATES):
+            assessment_usage = []
+            latencies = []
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def generate(index):
+                async with semaphore:
+                    assessment = PersonalityAssessment("benchmark", client=fake, prompt_version=version)
+                    start = time.perf_counter()
+                    await assessment.process_personality_async(sample_submission(index)["questionAnswers"])
+                    latencies.append(time.perf_counter() - start)
+                    assessment_usage.append(assessment.usage)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(generate(index) for index in range(concurrency * args.rounds)))
+            elapsed = time.perf_counter() - start
+            prompt_tokens = statistics.fmean(usage["prompt_tokens"] for usage in assessment_usage)
+            completion_tokens = statistics.fmean(usage["completion_tokens"] for usage in assessment_usage)
+            result = {
+                "scenario": "prompts", "endpoint": version, "concurrency": concurrency, "errors": 0,
+                "prompt_tokens_mean": round(prompt_tokens, 1),
+                "completion_tokens_mean": round(completion_tokens, 1),
+                "truncated": sum(1 for usage in assessment_usage if usage["finish_reason"] == "length"),
+                "cost_per_1k_usd": round(
+                    (prompt_tokens * args.input_price + completion_tokens * args.output_price) / 1000, 4
+                )
+            }
+            result.update(summarize(latencies, elapsed))
+            results.append(result)
+    return results
+
+
+def compare_reports(baseline, current):
+    """
+    Pair up results by (scenario, endpoint, concurrency) and report the p99
+    and throughput ratios current / baseline
+    """
+    def keyed(report):
+        return {
+            (row["scenario"], row.get("endpoint", ""), row["concurrency"]): row
+            for row in report["results"]
+        }
+
+    before = keyed(baseline)
+    rows = []
+    for key, row in keyed(current).items():
+        if key not in before:
+            continue
+        old = before[key]
+        rows.append({
+            "scenario": key[0], "endpoint": key[1], "concurrency": key[2],
+            "p99_ratio": round(row["p99_ms"] / old["p99_ms"], 3) if old["p99_ms"] else None,
+            "throughput_ratio": round(row["throughput_rps"] / old["throughput_rps"], 3)
+            if old["throughput_rps"] else None
+        })
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_metrics_overhead(args):
+    """
+    Micro-benchmark the instrumentation hot path: histogram observe, a timed
+    block, and one ASGI request through LatencyMiddleware versus without it.
+    """
+    iterations = args.rounds * 25000
+    histogram = metrics.Histogram("bench_seconds", "benchmark", ("route", "status"))
+
+    def per_call_ns(func):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return round((time.perf_counter() - start) / iterations * 1e9, 1)
+
+    def timed_block():
+        with histogram.time("/bench", "200"):
+            pass
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def noop_send(message):
+        pass
+
+    async def per_request_ns(app):
+        scope = {"type": "http", "method": "GET", "path": "/bench"}
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await app(scope, None, noop_send)
+        return round((time.perf_counter() - start) / iterations * 1e9, 1)
+
+    async def run():
+        return {
+            "observe_ns": per_call_ns(lambda: histogram.observe(0.012, "/bench", "200")),
+            "timed_block_ns": per_call_ns(timed_block),
+            "asgi_request_ns": await per_request_ns(endpoint),
+            "asgi_request_with_middleware_ns": await per_request_ns(metrics.LatencyMiddleware(endpoint)),
+        }
+
+    result = {"scenario": "metrics", "concurrency": 1, "iterations": iterations}
+    result.update(asyncio.run(run()))
+    result["middleware_overhead_ns"] = round(
+        result["asgi_request_with_middleware_ns"] - result["asgi_request_ns"], 1
+    )
+    start = time.perf_counter()
+    metrics.REGISTRY.render()
+    result["render_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return [result]
+
+
+async def bench_metrics(args):
+    # The timing loops run on their own event loop in a worker thread
+    return await asyncio.to_thread(bench_metrics_overhead, args)
+
+
+def measure_cold_start(workers, env):
+    """
+    Start the production entry point (python main.py) and poll /health
+
+    Returns:
+        float: seconds from process spawn to the first 200 from /health
+    """
+    port = free_port()
+    env = dict(env, SERVER_HOST="127.0.0.1", SERVER_PORT=str(port), SERVER_WORKERS=str(workers),
+               SERVER_LOG_LEVEL="warning")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"main.py exited with {process.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def measure_import():
+    code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+async def bench_cold_start(args):
+    """
+    Cold start of the production entry point: import time of main and time
+    to the first healthy /health for each --workers count. MONGODB_URI
+    defaults to an unreachable address with a short server selection
+    timeout, so the bounded warm-up fails fast; point it at a real server
+    to include the ping and index creation.
+    """
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URI", "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200")
+    env.setdefault("STARTUP_WARMUP_TIMEOUT", "1")
+
+    def run():
+        results = []
+        imports = [measure_import() for _ in range(args.rounds)]
+        for workers in args.workers:
+            samples = [measure_cold_start(workers, env) for _ in range(args.rounds)]
+            results.append({
+                "scenario": "cold-start", "concurrency": workers, "workers": workers,
+                "rounds": args.rounds,
+                "import_ms": round(statistics.median(imports) * 1000, 1),
+                "first_health_ms_median": round(statistics.median(samples) * 1000, 1),
+                "first_health_ms_max": round(max(samples) * 1000, 1)
+            })
+        return results
+
+    return await asyncio.to_thread(run)
+
+
+def synthetic_assessments(count):
+    # Shaped like stored assessments: ObjectIds, datetimes, lists, a long text
+    options = ["A", "B", "C", "D"]
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": str(ObjectId()),
+            "question_answers": [options[(index >> (2 * q)) % 4] for q in range(6)],
+            "image_answers": ["img1", "img2"],
+            "personality_result": FAKE_ANALYSIS,
+            "dominant_trait": "Leader",
+            "trait_scores": {"counts": {"Leader": 3, "Strategist": 1, "Empath": 1, "Adventurer": 1},
+                             "version": 1},
+            "assessment_date": base + timedelta(seconds=index)
+        }
+        for index in range(count)
+    ]
+
+
+def bench_serialization_sizes(args):
+    """
+    Serialize 10k and 100k assessment documents three ways and report wall
+    time, peak traced allocations and output size for each.
+    """
+    encoders = {
+        # What a plain ``return documents`` costs through FastAPI (ObjectId needs a custom encoder)
+        "jsonable_encoder": lambda documents: json.dumps(
+            jsonable_encoder(documents, custom_encoder={ObjectId: str})
+        ).encode("utf-8"),
+        # The previous listing path: copy each document, then the stdlib encoder
+        "encode_value+json": lambda documents: json.dumps(
+            admin_listing.encode_value(documents)
+        ).encode("utf-8"),
+        "fast_path": admin_listing.dumps,
+    }
+    results = []
+    for size in args.sizes:
+        documents = synthetic_assessments(size)
+        for name, encode in encoders.items():
+            start = time.perf_counter()
+            body = encode(documents)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            encode(documents)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({
+                "scenario": "serialization", "concurrency": size, "documents": size,
+                "encoder": name, "elapsed_ms": round(elapsed * 1000, 1),
+                "peak_alloc_mb": round(peak / 1e6, 1), "bytes": len(body)
+            })
+    return results
+
+
+def seed_feedback(db, count, days=365):
+    now = datetime.utcnow()
+    step = days * 86400 / count
+    db.feedback.insert_many([
+        dict(feedback_record(index), timestamp=now - timedelta(seconds=index * step))
+        for index in range(count)
+    ])
+
+
+def feedback_record(index):
+    feedback = sample_feedback(index)
+    return {"feedback_scores": feedback["feedbackScores"], "additional_comments": feedback["additionalComments"]}
+
+
+async def bench_range_analytics(args):
+    """
+    A year of feedback, weekly trend of the clarity score three ways: the old
+    client-side route (full NDJSON listing, bucketed in Python), the series
+    endpoint with an empty bucket cache, and again with closed buckets
+    cached. Also the peak memory of streaming the year as CSV.
+    """
+    async def timed_get(client, path):
+        start = time.perf_counter()
+        response = await client.get(path)
+        return response, time.perf_counter() - start
+
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    main.db = fresh_db()
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for size in args.sizes:
+            reset_state()
+            seed_feedback(main.db, size)
+            start = (datetime.utcnow() - timedelta(days=365)).isoformat()
+            series_path = f"/api/admin/analytics/feedback/series?bucket=week&start={start}"
+
+            response, elapsed = await timed_get(client, "/api/admin/feedbacks?format=ndjson")
+            weeks = {}
+            for line in response.text.splitlines():
+                document = json.loads(line)
+                week = bucket_start(datetime.fromisoformat(document["timestamp"]), "week")
+                weeks.setdefault(week, []).append(document["feedback_scores"]["clarity"])
+            rows = [("client_side", response, elapsed, len(weeks))]
+
+            for endpoint in ("series_cold", "series_cached"):
+                response, elapsed = await timed_get(client, series_path)
+                rows.append((endpoint, response, elapsed, len(response.json()["buckets"])))
+
+            tracemalloc.start()
+            exported = 0
+            async for chunk in iter_csv(main.db.feedback, "timestamp", datetime.utcnow() - timedelta(days=366),
+                                        datetime.utcnow(), ("_id", "timestamp", "feedback_scores.clarity")):
+                exported += len(chunk)
+            export_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            for endpoint, response, elapsed, buckets in rows:
+                results.append({
+                    "scenario": "range-analytics", "endpoint": endpoint, "concurrency": size,
+                    "documents": size, "buckets": buckets, "errors": int(response.status_code >= 400),
+                    "elapsed_ms": round(elapsed * 1000, 1), "response_bytes": len(response.content),
+                    "p99_ms": round(elapsed * 1000, 1), "throughput_rps": round(1 / elapsed, 2)
+                })
+            results.append({
+                "scenario": "range-analytics", "endpoint": "export_csv", "concurrency": size,
+                "documents": size, "errors": 0, "bytes": exported,
+                "peak_alloc_mb": round(export_peak / 1e6, 2)
+            })
+            main.db[BUCKET_COLLECTION].delete_many({})
+    return results
+
+
+async def bench_serialization(args):
+    return await asyncio.to_thread(bench_serialization_sizes, args)
+
+
+SCENARIOS = {
+    "submit": bench_submit,
+    "stream": bench_stream,
+    "same-user": bench_same_user,
+    "suite": bench_suite,
+    "metrics": bench_metrics,
+    "cold-start": bench_cold_start,
+    "serialization": bench_serialization,
+    "overload": bench_overload,
+    "prompts": bench_prompts,
+    "fallback": bench_fallback,
+    "jobs": bench_jobs,
+    "range-analytics": bench_range_analytics,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Personality Assessment API benchmarks")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        type=lambda value: [int(v) for v in value.split(",")],
+                        help="Comma separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=4,
+                        help="Requests per worker at each concurrency level "
+                             "(overload scenario: seconds of offered load, concurrency = requests/s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2,
+                        help="Artificial latency of the fake LLM in seconds")
+    parser.add_argument("--llm-token-rate", type=float, default=50.0,
+                        help="Tokens per second streamed by the fake LLM")
+    parser.add_argument("--workers", default="1,2",
+                        type=lambda value: [int(v) for v in value.split(",")],
+                        help="Cold-start scenario: server worker processes; "
+                             "jobs scenario: job worker pool sizes (comma separated)")
+    parser.add_argument("--sizes", default="10000,100000",
+                        type=lambda value: [int(v) for v in value.split(",")],
+                        help="Serialization and range-analytics scenarios: comma separated document counts")
+    parser.add_argument("--llm-prefill-rate", type=float, default=0.0,
+                        help="Prompt tokens per second the fake LLM charges before answering "
+                             "(0 = none; the prompts scenario uses 2000 then)")
+    parser.add_argument("--llm-budget", type=float, default=0.5,
+                        help="Fallback scenario: LLM latency budget in seconds")
+    parser.add_argument("--input-price", type=float, default=2.0,
+                        help="Prompts scenario: USD per million prompt tokens")
+    parser.add_argument("--output-price", type=float, default=6.0,
+                        help="Prompts scenario: USD per million completion tokens")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0,
+                        help="Fraction of fake LLM calls failing with a retryable 503")
+    parser.add_argument("--disconnect-every", type=int, default=4,
+                        help="Stream scenario: every Nth client disconnects after the first token (0 = never)")
+    parser.add_argument("--admission-concurrent", type=int, default=16,
+                        help="Overload scenario: LLM work slots when admission control is on")
+    parser.add_argument("--admission-queue", type=int, default=16,
+                        help="Overload scenario: requests allowed to wait for a slot")
+    parser.add_argument("--admission-timeout", type=float, default=0.5,
+                        help="Overload scenario: seconds a queued request waits before a 503")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare p99 and throughput against")
+    return parser.parse_args()
+
+
+# Boolean result fields that must be true; a false one fails the run
+CHECK_FIELDS = ("all_stored", "ok")
+
+
+def failed_checks(results):
+    return [(row, field) for row in results for field in CHECK_FIELDS if row.get(field) is False]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_TOKEN_RATE"] = str(args.llm_token_rate)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["FAKE_LLM_PREFILL_RATE"] = str(args.llm_prefill_rate)
+    results = asyncio.run(SCENARIOS[args.scenario](args))
+    report = {
+        "scenario": args.scenario,
+        "revision": git_revision(),
+        "parameters": {name: value for name, value in vars(args).items()
+                       if name not in ("scenario", "output", "compare")},
+        "results": results
+    }
+    if args.compare:
+        with open(args.compare) as handle:
+            report["comparison"] = compare_reports(json.load(handle), report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    failures = failed_checks(results)
+    for row, field in failures:
+        print(f"Check failed: {row['scenario']} {row.get('endpoint', '')} concurrency={row.get('concurrency')}: "
+              f"{field} is false", file=sys.stderr)
+    if failures:
+        sys.exit(1)
@@ -1,5 +1,76 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from pymongo import MongoClient
 
+from metrics import DB_LATENCY, db_call_labels
+
+# Bounded thread pool for blocking PyMongo calls so they never run on the
+# event loop. Size it with DB_EXECUTOR_WORKERS; keep it below the MongoClient
+# maxPoolSize (100 by default) so threads never queue for a connection.
+_db_executor = None
+
+
+def get_db_executor():
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", "32")),
+            thread_name_prefix="mongo"
+        )
+    return _db_executor
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run a blocking database call in the bounded DB executor
+
+    Returns:
+        The return value of ``func(*args, **kwargs)``
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(
+            get_db_executor(), functools.partial(func, *args, **kwargs)
+        )
+    finally:
+        DB_LATENCY.observe(time.perf_counter() - start, *db_call_labels(func))
+
+
+# MongoDB Connection
+def get_mongodb_connection():
+    """
+    Establish MongoDB connection
+    
+    Returns:
+        pymongo.database.Database: Connected MongoDB database instance
+    """
+    try:
+        # Get MongoDB connection string from environment variable
+        mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+        database_name = os.getenv("DATABASE_NAME", "personality_assessment")
+        
+        # Create MongoDB client
+        client = MongoClient(mongo_uri)
+        db = client[database_name]
+        
+        return db
+    except Exception as e:
+        print(f"MongoDB Connection Error: {e}")
+        raise
+
+
+def shutdown_db_executor():
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
+
+
 class DatabaseConnection:
     def __init__(self, connection_string="mongodb://localhost:27017/"):
         self.client = MongoClient(connection_string)
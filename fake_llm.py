@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+# Local stand-ins for Mistral, used for benchmarks and offline runs:
+# - FakeMistral, an in-process client selected with LLM_PROVIDER=fake
+# - create_fake_mistral_app, an HTTP server speaking the /v1/chat/completions
+#   protocol, so the real client, connection pool and retries are exercised:
+#   "python fake_llm.py --port 8081" and MISTRAL_SERVER_URL=http://127.0.0.1:8081
+# FAKE_LLM_LATENCY sets the time to the full response (or first token when
+# streaming), FAKE_LLM_TOKEN_RATE the tokens/s and FAKE_LLM_ERROR_RATE the
+# fraction of calls failing with a retryable 503. FAKE_LLM_PREFILL_RATE adds
+# prompt tokens / rate seconds per call, so longer prompts answer later.
+# Both honour max_tokens (truncating with finish_reason "length") and report
+# usage like Mistral, on the response or on the final stream chunk.
+
+FAKE_ANALYSIS = (
+    "You bring a rare mix of drive and warmth to everything you take on. "
+    "People notice how quickly you turn an idea into a plan, and how you "
+    "still make room for the people around you while you do it.\n\n"
+    "Careers that reward both vision and collaboration will suit you best: "
+    "product management, consulting, entrepreneurship or team leadership "
+    "are all paths where your strengths would shine."
+)
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _usage(prompt, content):
+    return SimpleNamespace(
+        prompt_tokens=_estimate_tokens(prompt),
+        completion_tokens=_estimate_tokens(content),
+        total_tokens=_estimate_tokens(prompt) + _estimate_tokens(content)
+    )
+
+
+def _capped(content, max_tokens):
+    """
+    Returns:
+        tuple: (content cut to ``max_tokens``, finish reason)
+    """
+    if max_tokens and _estimate_tokens(content) > max_tokens:
+        return content[:4 * max_tokens], "length"
+    return content, "stop"
+
+
+def _prefill_delay(prompt, prefill_rate):
+    return _estimate_tokens(prompt) / prefill_rate if prefill_rate > 0 else 0.0
+
+
+def _completion_response(model, prompt, content, finish_reason="stop"):
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(
+            index=0,
+            message=SimpleNamespace(role="assistant", content=content),
+            finish_reason=finish_reason
+        )],
+        usage=_usage(prompt, content)
+    )
+
+
+class FakeLLMError(Exception):
+    def __init__(self, status_code=503, message="Fake LLM unavailable"):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _stream_event(model, token, finish_reason=None, usage=None):
+    return SimpleNamespace(data=SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(
+            index=0,
+            delta=SimpleNamespace(role="assistant", content=token),
+            finish_reason=finish_reason
+        )],
+        usage=usage
+    ))
+
+
+def _tokens(content):
+    words = content.split(" ")
+    return [word if index == len(words) - 1 else word + " " for index, word in enumerate(words)]
+
+
+class FakeChat:
+    def __init__(self, latency, content, token_rate=0.0, error_rate=0.0, prefill_rate=0.0):
+        self.latency = latency
+        self.content = content
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.prefill_rate = prefill_rate
+        self.calls = 0
+
+    def _maybe_fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeLLMError()
+
+    @staticmethod
+    def _prompt(messages):
+        return " ".join(message["content"] for message in messages)
+
+    def complete(self, model, messages, max_tokens=None, **kwargs):
+        self.calls += 1
+        prompt = self._prompt(messages)
+        time.sleep(self.latency + _prefill_delay(prompt, self.prefill_rate))
+        self._maybe_fail()
+        return _completion_response(model, prompt, *_capped(self.content, max_tokens))
+
+    async def complete_async(self, model, messages, max_tokens=None, **kwargs):
+        self.calls += 1
+        prompt = self._prompt(messages)
+        await asyncio.sleep(self.latency + _prefill_delay(prompt, self.prefill_rate))
+        self._maybe_fail()
+        return _completion_response(model, prompt, *_capped(self.content, max_tokens))
+
+    async def stream_async(self, model, messages, max_tokens=None, **kwargs):
+        self.calls += 1
+        self._maybe_fail()
+        return self._stream_tokens(model, self._prompt(messages), max_tokens)
+
+    async def _stream_tokens(self, model, prompt, max_tokens):
+        await asyncio.sleep(self.latency + _prefill_delay(prompt, self.prefill_rate))
+        token_delay = 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+        content, finish_reason = _capped(self.content, max_tokens)
+        tokens = _tokens(content)
+        for index, token in enumerate(tokens):
+            last = index == len(tokens) - 1
+            if last:
+                yield _stream_event(model, token, finish_reason, _usage(prompt, content))
+            else:
+                yield _stream_event(model, token)
+            if token_delay and not last:
+                await asyncio.sleep(token_delay)
+
+
+class FakeMistral:
+    """
+    Drop-in replacement for ``mistralai.Mistral`` exposing the subset of the
+    chat API this service uses, with a fixed artificial latency per call.
+    """
+
+    def __init__(self, latency=0.5, content=FAKE_ANALYSIS, token_rate=0.0, error_rate=0.0, prefill_rate=0.0):
+        self.chat = FakeChat(latency, content, token_rate, error_rate, prefill_rate)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+            token_rate=float(os.getenv("FAKE_LLM_TOKEN_RATE", "0")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            prefill_rate=float(os.getenv("FAKE_LLM_PREFILL_RATE", "0"))
+        )
+
+
+def create_fake_mistral_app(latency=0.5, token_rate=0.0, error_rate=0.0, content=FAKE_ANALYSIS,
+                            prefill_rate=0.0):
+    """
+    ASGI app answering POST /v1/chat/completions like the Mistral API, both
+    as one JSON body and as server-sent events when ``stream`` is true
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    stats = {"calls": 0, "errors": 0}
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats["calls"] += 1
+        model = body.get("model", "fake")
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+        completion_id = uuid.uuid4().hex
+        created = int(time.time())
+
+        await asyncio.sleep(latency + _prefill_delay(prompt, prefill_rate))
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"object": "error", "message": "Fake LLM unavailable"}, status_code=503)
+
+        text, finish_reason = _capped(content, body.get("max_tokens"))
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": finish_reason
+                }],
+                "usage": vars(_usage(prompt, text))
+            })
+
+        async def events():
+            token_delay = 1.0 / token_rate if token_rate > 0 else 0.0
+            tokens = _tokens(text)
+            for index, token in enumerate(tokens):
+                last = index == len(tokens) - 1
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": token},
+                        "finish_reason": finish_reason if last else None
+                    }]
+                }
+                if last:
+                    chunk["usage"] = vars(_usage(prompt, text))
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if token_delay and not last:
+                    await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def get_stats(request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", get_stats)
+    ])
+    app.state.stats = stats
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a fake Mistral chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=float(os.getenv("FAKE_LLM_LATENCY", "0.5")))
+    parser.add_argument("--token-rate", type=float, default=float(os.getenv("FAKE_LLM_TOKEN_RATE", "0")))
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")))
+    parser.add_argument("--prefill-rate", type=float, default=float(os.getenv("FAKE_LLM_PREFILL_RATE", "0")))
+    args = parser.parse_args()
+    uvicorn.run(
+        create_fake_mistral_app(args.latency, args.token_rate, args.error_rate, prefill_rate=args.prefill_rate),
+        host=args.host, port=args.port, log_level="warning"
+    )
@@ -0,0 +1,77 @@
+from collections import Counter
+
+# Deterministic two-paragraph analysis assembled from the selected traits,
+# served when the LLM errors or misses its latency budget (see
+# personality_processing.generate_with_fallback). It is plain string
+# assembly, a few microseconds per call, and the same answers always give
+# the same text. Assessments answered this way are regenerated with the LLM
+# later (regeneration.py).
+
+FALLBACK_VERSION = "template-v1"
+
+PERSONALITY = {
+    "Leader": "You tend to step forward when others hesitate, and people naturally look to you to set the direction.",
+    "Strategist": "You like to understand how the pieces fit together before you act, and your plans tend to hold up when it matters.",
+    "Empath": "You notice how the people around you are really doing, and they trust you because you care about getting things right for them.",
+    "Adventurer": "New and untried things give you energy, and you would rather learn by doing than wait for a perfect plan.",
+}
+
+SECONDARY = {
+    "Leader": "you are ready to take charge when it counts",
+    "Strategist": "you like to think a few steps ahead",
+    "Empath": "you keep people at the heart of your decisions",
+    "Adventurer": "you are happy to take a chance on something new",
+}
+
+CAREERS = {
+    "Leader": "roles where you own the outcome and lead others, such as management, entrepreneurship, public service or team leadership",
+    "Strategist": "roles that reward structured thinking, such as engineering, data analysis, finance, law or operations planning",
+    "Empath": "roles built around people, such as psychology, teaching, healthcare, human resources or social work",
+    "Adventurer": "roles with variety and room to experiment, such as design, media, hospitality, startups or field research",
+}
+
+CAREER_FIT = {
+    "Leader": "leading a team",
+    "Strategist": "planning and analytical work",
+    "Empath": "people-focused work",
+    "Adventurer": "creative, fast-moving work",
+}
+
+
+def _subtrait_name(subtrait):
+    return "the " + (subtrait[4:] if subtrait.startswith("The ") else subtrait)
+
+
+def _join(items):
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def _article(word):
+    return "an" if word[0] in "AEIOU" else "a"
+
+
+def build_fallback_analysis(selected_traits, dominant_trait):
+    """
+    Args:
+        selected_traits: the six {"primary", "subtrait"} dicts for the answers
+        dominant_trait: the primary to lead with
+
+    Returns:
+        str: two paragraphs addressed to the person, like the LLM analysis
+    """
+    counts = Counter(trait["primary"] for trait in selected_traits)
+    # Other primaries by how often they were picked, then by first appearance
+    others = sorted((primary for primary in counts if primary != dominant_trait), key=lambda p: -counts[p])
+    subtraits = [_subtrait_name(trait["subtrait"]) for trait in selected_traits
+                 if trait["primary"] == dominant_trait]
+
+    personality = [PERSONALITY[dominant_trait], f"Your answers point to {_join(subtraits)} in you."]
+    for primary in others[:2]:
+        personality.append(f"There is also {_article(primary)} {primary} side to you: {SECONDARY[primary]}.")
+
+    careers = [f"When it comes to your career, look for {CAREERS[dominant_trait]}."]
+    if others:
+        careers.append(f"Your {others[0]} side could also make {CAREER_FIT[others[0]]} a good fit.")
+    careers.append("Whatever you choose, build on what already comes naturally to you.")
+
+    return " ".join(personality) + "\n\n" + " ".join(careers)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Dependency health for /readyz, refreshed in the background so probe traffic
+# never reaches MongoDB: a single Mongo ping every HEALTH_PROBE_INTERVAL
+# seconds on its own thread (a hung ping cannot pile up or occupy the request
+# DB pool), combined at request time with in-memory state that costs nothing
+# to read (LLM circuit breaker, write-behind queue depth).
+
+
+class HealthMonitor:
+    def __init__(self, get_db, get_llm_manager, get_write_queue, interval=5.0, timeout=2.0,
+                 stale_after=None, queue_high_water=0.9, require_llm=False):
+        self.get_db = get_db
+        self.get_llm_manager = get_llm_manager
+        self.get_write_queue = get_write_queue
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after if stale_after is not None else 3 * interval + timeout
+        self.queue_high_water = queue_high_water
+        self.require_llm = require_llm
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health")
+        self._pending_ping = None
+        self._task = None
+        self.mongo = {"ok": False, "latency_ms": None, "checked_at": None, "error": "not checked yet"}
+
+    @classmethod
+    def from_env(cls, get_db, get_llm_manager, get_write_queue):
+        return cls(
+            get_db, get_llm_manager, get_write_queue,
+            interval=float(os.getenv("HEALTH_PROBE_INTERVAL", "5")),
+            timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "2")),
+            queue_high_water=float(os.getenv("READYZ_QUEUE_HIGH_WATER", "0.9")),
+            require_llm=os.getenv("READYZ_REQUIRE_LLM", "false").lower() == "true"
+        )
+
+    def start(self):
+        self._task = asyncio.create_task(self._probe_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def _probe_loop(self):
+        while True:
+            await self.probe_mongo()
+            await asyncio.sleep(self.interval)
+
+    async def probe_mongo(self):
+        if self._pending_ping is not None and not self._pending_ping.done():
+            # The previous ping is still stuck; do not stack another one
+            self.mongo = dict(self.mongo, ok=False, error="ping still pending")
+            return
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self._pending_ping = loop.run_in_executor(self._executor, self.get_db().command, "ping")
+        # A ping that outlives its timeout still finishes; consume its error quietly
+        self._pending_ping.add_done_callback(lambda ping: ping.cancelled() or ping.exception())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._pending_ping), self.timeout)
+            self.mongo = {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - start), 2),
+                          "checked_at": time.time(), "error": None}
+        except Exception as e:
+            self.mongo = {"ok": False, "latency_ms": None, "checked_at": time.time(),
+                          "error": repr(e) if not isinstance(e, asyncio.TimeoutError) else "ping timed out"}
+
+    def llm_status(self):
+        manager = self.get_llm_manager()
+        if manager is None:
+            return {"ok": False, "breaker": None, "error": "LLM client not configured"}
+        state = manager.breaker.state
+        return {"ok": state != manager.breaker.OPEN, "breaker": state,
+                "consecutive_failures": manager.breaker.failures}
+
+    def write_queue_status(self):
+        queue = self.get_write_queue()
+        if queue is None:
+            return {"ok": True, "enabled": False}
+        return {"ok": queue.depth < self.queue_high_water * queue.maxsize, "enabled": True,
+                "depth": queue.depth, "maxsize": queue.maxsize, "lag_seconds": round(queue.lag, 4)}
+
+    def readiness(self):
+        """
+        Returns:
+            tuple: (ready, details). Not ready when the last Mongo ping failed
+            or is stale, when the write-behind queue is above its high-water
+            mark, or (with READYZ_REQUIRE_LLM=true) when the LLM circuit is open.
+        """
+        mongo = dict(self.mongo)
+        if mongo["ok"] and time.time() - mongo["checked_at"] > self.stale_after:
+            mongo.update(ok=False, error="last successful ping is stale")
+        llm = self.llm_status()
+        write_queue = self.write_queue_status()
+        ready = mongo["ok"] and write_queue["ok"] and (llm["ok"] or not self.require_llm)
+        return ready, {"mongo": mongo, "llm": llm, "write_queue": write_queue}
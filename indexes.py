@@ -0,0 +1,156 @@
+import argparse
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import get_mongodb_connection
+
+# Declarative index registry, applied idempotently at startup (see main.py)
+# or from the command line: python indexes.py [--explain] [--dedupe-users]
+INDEXES = {
+    "users": [
+        # resolve_user_id: find_one({"name", "user_type"}); one user per pair
+        IndexModel([("name", ASCENDING), ("user_type", ASCENDING)],
+                   name="name_user_type_unique", unique=True),
+        # get_assessment fallback: find_one({"name"}, sort created_at desc)
+        IndexModel([("name", ASCENDING), ("created_at", DESCENDING)],
+                   name="name_created_at"),
+        # analytics_rollups.read_user_analytics: partial first day of the week
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "assessments": [
+        # get_assessment: find_one({"user_id"}, sort assessment_date desc)
+        IndexModel([("user_id", ASCENDING), ("assessment_date", DESCENDING)],
+                   name="user_id_assessment_date"),
+        # regeneration.claim_pending: only fallback analyses are indexed
+        IndexModel([("needs_regeneration", ASCENDING)], name="needs_regeneration",
+                   partialFilterExpression={"needs_regeneration": True}),
+        # assessment_jobs.claim_job: only queued and running jobs carry the field
+        IndexModel([("job_available_at", ASCENDING)], name="job_available_at", sparse=True),
+        # range_analytics: $match on the date range, CSV export keyset
+        IndexModel([("assessment_date", ASCENDING), ("_id", ASCENDING)], name="assessment_date_id"),
+    ],
+    "feedback": [
+        IndexModel([("timestamp", ASCENDING), ("_id", ASCENDING)], name="timestamp_id"),
+    ],
+}
+
+# Hot query shapes from main.py, checked with explain() for index coverage
+QUERY_SHAPES = [
+    {"name": "resolve_user_id", "collection": "users",
+     "filter": {"name": "x", "user_type": "Student"}, "sort": None},
+    {"name": "get_assessment_by_user_id", "collection": "assessments",
+     "filter": {"user_id": "x"}, "sort": None},
+    {"name": "get_assessment_user_by_name", "collection": "users",
+     "filter": {"name": "x"}, "sort": [("created_at", DESCENDING)]},
+    {"name": "get_assessment_latest_for_user", "collection": "assessments",
+     "filter": {"user_id": "x"}, "sort": [("assessment_date", DESCENDING)]},
+    {"name": "range_analytics_assessments", "collection": "assessments",
+     "filter": {"assessment_date": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}, "sort": None},
+    {"name": "range_analytics_feedback", "collection": "feedback",
+     "filter": {"timestamp": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}, "sort": None},
+]
+
+
+def ensure_indexes(db, registry=None):
+    """
+    Create every index in the registry; existing identical indexes are a no-op
+
+    Returns:
+        dict: collection name -> list of index names created or confirmed
+    """
+    applied = {}
+    for collection_name, models in (registry or INDEXES).items():
+        applied[collection_name] = []
+        # One call per index so a single failure does not block the others
+        for model in models:
+            try:
+                applied[collection_name] += db[collection_name].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate users blocking the unique index; run --dedupe-users
+                print(f"Index creation failed for {collection_name}.{model.document['name']}: {e}")
+    return applied
+
+
+def _find_index_scan(plan):
+    if plan.get("stage") == "IXSCAN":
+        return plan.get("indexName")
+    children = plan.get("inputStages") or [plan.get("inputStage") or {}]
+    for child in children:
+        index_name = _find_index_scan(child)
+        if index_name:
+            return index_name
+    return None
+
+
+def explain_queries(db, shapes=None):
+    """
+    Run explain() on each hot query shape
+
+    Returns:
+        list: one report dict per shape with the index used (None = collection scan)
+    """
+    report = []
+    for shape in shapes or QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"]).limit(1)
+        if shape["sort"]:
+            cursor = cursor.sort(shape["sort"])
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        index_name = _find_index_scan(plan)
+        report.append({
+            "query": shape["name"],
+            "collection": shape["collection"],
+            "index": index_name,
+            "covered": index_name is not None
+        })
+    return report
+
+
+def dedupe_users(db):
+    """
+    Merge users sharing a (name, user_type) pair into the oldest document,
+    re-pointing their assessments, so the unique index can be built
+
+    Returns:
+        int: number of duplicate user documents removed
+    """
+    removed = 0
+    duplicates = db.users.aggregate([
+        {"$sort": {"created_at": ASCENDING}},
+        {"$group": {
+            "_id": {"name": "$name", "user_type": "$user_type"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    for group in duplicates:
+        keep, *extra = group["ids"]
+        db.assessments.update_many(
+            {"user_id": {"$in": [str(user_id) for user_id in extra]}},
+            {"$set": {"user_id": str(keep)}}
+        )
+        removed += db.users.delete_many({"_id": {"$in": extra}}).deleted_count
+    return removed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Apply and check MongoDB indexes")
+    parser.add_argument("--dedupe-users", action="store_true",
+                        help="Merge duplicate users before creating the unique index")
+    parser.add_argument("--explain", action="store_true",
+                        help="Report which hot queries are served by an index")
+    args = parser.parse_args()
+
+    db = get_mongodb_connection()
+    if args.dedupe_users:
+        print(f"Removed {dedupe_users(db)} duplicate users")
+    for collection_name, names in ensure_indexes(db).items():
+        print(f"{collection_name}: {', '.join(names) or 'none applied'}")
+    if args.explain:
+        for row in explain_queries(db):
+            status = f"IXSCAN {row['index']}" if row["covered"] else "COLLSCAN"
+            print(f"{row['query']:<32} {row['collection']:<12} {status}")
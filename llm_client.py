@@ -0,0 +1,261 @@
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from metrics import LLM_FIRST_TOKEN, LLM_LATENCY, record_llm_usage
+from personality_processing import create_llm_client
+
+# Process-wide LLM client: one pooled HTTP client shared by every request,
+# wrapped with per-call timeouts, a concurrency cap, jittered retries and a
+# circuit breaker. Created in the FastAPI startup hook, closed at shutdown.
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and fails fast for
+    ``reset_timeout`` seconds, then lets a single trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """
+        Returns:
+            bool: True when this call is the half-open trial
+        """
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpenError("LLM provider circuit is open")
+        if state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError("LLM provider circuit is half-open, trial call in flight")
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self._state != self.CLOSED or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self, trial):
+        """
+        A call was cancelled before the provider answered (e.g. by a latency
+        hedge). A cancelled trial means the provider is still too slow, so the
+        circuit opens again; any other cancelled call says nothing either way.
+        """
+        if trial:
+            self.record_failure()
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class ManagedChat:
+    """
+    ``chat`` facade with the same call signature as ``Mistral.chat``
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def complete(self, **kwargs):
+        return self.manager.client.chat.complete(**kwargs)
+
+    async def complete_async(self, **kwargs):
+        return await self.manager.call(self.manager.client.chat.complete_async, **kwargs)
+
+    async def stream_async(self, **kwargs):
+        return self.manager.stream(self.manager.client.chat.stream_async, **kwargs)
+
+
+class LLMClientManager:
+    def __init__(self, api_key, timeout=30.0, max_concurrency=16, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0, max_connections=32,
+                 keepalive_connections=16, breaker=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.http_client = None
+        self.client = self._create_client(api_key, max_connections, keepalive_connections)
+        self.chat = ManagedChat(self)
+
+    def _create_client(self, api_key, max_connections, keepalive_connections):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=keepalive_connections
+            ),
+            timeout=self.timeout
+        )
+        return create_llm_client(api_key, async_client=self.http_client)
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, func, timeout=None, **kwargs):
+        """
+        Call ``func(**kwargs)`` under the concurrency cap, timeout, retry and breaker policies
+
+        Returns:
+            The provider response
+        """
+        timeout = self.timeout if timeout is None else timeout
+        operation = getattr(func, "__name__", "call")
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            try:
+                async with self.semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await asyncio.wait_for(func(**kwargs), timeout)
+                    except asyncio.TimeoutError:
+                        LLM_LATENCY.observe(time.perf_counter() - start, operation, "timeout")
+                        raise
+                    except Exception:
+                        LLM_LATENCY.observe(time.perf_counter() - start, operation, "error")
+                        raise
+                    LLM_LATENCY.observe(time.perf_counter() - start, operation, "ok")
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered (e.g. a 400); that is not degradation
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.record_cancelled(trial)
+                raise
+            self.breaker.record_success()
+            record_llm_usage(response)
+            return response
+
+    async def stream(self, func, timeout=None, **kwargs):
+        """
+        Yield stream events from ``func(**kwargs)`` while holding a concurrency slot
+
+        ``timeout`` bounds opening the stream; once tokens flow there is no retry.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        trial = self.breaker.before_call()
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    events = await asyncio.wait_for(func(**kwargs), timeout)
+                    try:
+                        first = True
+                        async for event in events:
+                            if first:
+                                LLM_FIRST_TOKEN.observe(time.perf_counter() - start)
+                                first = False
+                            usage = getattr(getattr(event, "data", None), "usage", None)
+                            if usage is not None:
+                                record_llm_usage(event.data)
+                            yield event
+                        outcome = "ok"
+                    finally:
+                        close = getattr(events, "aclose", None)
+                        if close is not None:
+                            await close()
+                finally:
+                    LLM_LATENCY.observe(time.perf_counter() - start, "stream", outcome)
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled, or closed by the consumer (GeneratorExit) before the end
+            self.breaker.record_cancelled(trial)
+            raise
+        self.breaker.record_success()
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    @classmethod
+    def from_env(cls, api_key):
+        return cls(
+            api_key,
+            timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "32")),
+            keepalive_connections=int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "16")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+            )
+        )
+
+
+_manager = None
+
+
+def get_llm_manager():
+    return _manager
+
+
+def start_llm_manager(api_key):
+    global _manager
+    if _manager is None and api_key:
+        _manager = LLMClientManager.from_env(api_key)
+    return _manager
+
+
+async def close_llm_manager():
+    global _manager
+    if _manager is not None:
+        await _manager.aclose()
+        _manager = None
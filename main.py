@@ -1,12 +1,15 @@
+import asyncio
+import json
 import os
-
-from datetime import datetime, timedelta  
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from typing import List, Optional, Dict
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import APIRouter, FastAPI, HTTPException, Path, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.openapi.utils import get_openapi
 from fastapi.openapi.docs import (
     get_redoc_html,
@@ -17,54 +20,84 @@ from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 # Import custom modules
-from pymongo import MongoClient
-from personality_processing import process_personality_assessment
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from database import get_mongodb_connection, run_db, shutdown_db_executor
+from personality_processing import (
+    LLM_MODEL,
+    PROMPT_VERSION,
+    PersonalityAssessment,
+    LLM_LATENCY_BUDGET,
+    TRAIT_SCORER,
+    fallback_analysis,
+    fallback_usage,
+    generate_with_fallback,
+    is_truncated,
+    needs_regeneration,
+    process_personality_assessment_async,
+    reused_usage
+)
+from result_cache import LRUTTLCache, build_result_cache, normalize_answers
+from assessment_lookup import (
+    find_latest_assessment,
+    latest_assessment_summary,
+    set_latest_assessment,
+    set_latest_assessments
+)
+from write_behind import WriteBehindQueue
+from user_store import resolve_user_ids_bulk, upsert_user, user_key
+from single_flight import SingleFlight
+from llm_client import close_llm_manager, get_llm_manager, start_llm_manager
+from indexes import ensure_indexes
+from metrics import ADMISSION_REJECTED, ADMISSION_SLOTS, REGISTRY, LatencyMiddleware, record_cache
+from health import HealthMonitor
+from admission import AdmissionController, AdmissionRejected
+from regeneration import regenerate_pending
+from assessment_jobs import ACTIVE_STATUSES, COMPLETED, PENDING, JobWorkerPool, job_counts, job_fields
+from admin_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FastJSONResponse, list_collection
+from range_analytics import bucket_series, export_range_csv, series_csv
+from analytics_rollups import (
+    read_assessment_analytics,
+    read_feedback_analytics,
+    read_user_analytics,
+    record_assessment,
+    record_assessments,
+    record_feedback,
+    record_feedbacks,
+    record_user_created,
+    record_users_created
+)
 
 # Load environment variables
 load_dotenv()
 
-# Create FastAPI application
-app = FastAPI(
-    title="Personality Assessment API",
-    description="Backend server for personality assessment application",
-    version="1.0.0",
-    docs_url=None,
-    redoc_url=None
-)
+# Routes are collected on a router and mounted by create_app(). Nothing in
+# this module touches the network at import time: the Mongo client, result
+# cache and LLM client are built in the lifespan startup hook, so importing
+# main (including once per worker process) stays cheap.
+router = APIRouter()
 
-# CORS Middleware Configuration
-# CORS Middleware Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"]
-)
-# MongoDB Connection
-def get_mongodb_connection():
-    """
-    Establish MongoDB connection
-    
-    Returns:
-        pymongo.database.Database: Connected MongoDB database instance
-    """
-    try:
-        # Get MongoDB connection string from environment variable
-        mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-        database_name = os.getenv("DATABASE_NAME", "personality_assessment")
-        
-        # Create MongoDB client
-        client = MongoClient(mongo_uri)
-        db = client[database_name]
-        
-        return db
-    except Exception as e:
-        print(f"MongoDB Connection Error: {e}")
-        raise
+# Database Connection (Global Variable, set at startup)
+db = None
+
+# Generated analyses keyed by answer combination (see result_cache.py)
+result_cache = None
+# Identical answer sets submitted at the same moment share one LLM call
+llm_flights = SingleFlight()
 
-# Database Connection (Global Variable)
-db = get_mongodb_connection()
+# Read-through cache for /get-assessment keyed by user id or name. Unknown
+# identifiers are cached briefly as ASSESSMENT_NOT_FOUND; new submissions
+# invalidate both keys of the submitting user in this process only. With
+# SERVER_WORKERS > 1 the other workers keep serving the previous answer (or
+# the 404) until the entry expires, so the default TTLs drop to a few
+# seconds there; setting ASSESSMENT_CACHE_TTL accepts that staleness.
+_MULTI_WORKER = int(os.getenv("SERVER_WORKERS", "1")) > 1
+assessment_cache = LRUTTLCache(
+    maxsize=int(os.getenv("ASSESSMENT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ASSESSMENT_CACHE_TTL", "5" if _MULTI_WORKER else "300"))
+)
+ASSESSMENT_NEGATIVE_TTL = float(os.getenv("ASSESSMENT_CACHE_NEGATIVE_TTL", "1" if _MULTI_WORKER else "30"))
+ASSESSMENT_NOT_FOUND = object()
 
 # Pydantic Models
 class UserData(BaseModel):
@@ -77,13 +110,16 @@ class AssessmentSubmission(BaseModel):
     questionAnswers: List[str]
     imageAnswers: List[str]
 
+class BatchAssessmentSubmission(BaseModel):
+    submissions: List[AssessmentSubmission]
+
 # Corrected Feedback Model
 class FeedbackSubmission(BaseModel):
     feedbackScores: Dict[str, int]
     additionalComments: Optional[str] = None
 
 # Custom OpenAPI Documentation Routes
-@app.get("/docs", include_in_schema=False)
+@router.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
     return get_swagger_ui_html(
         openapi_url="/openapi.json",
@@ -91,112 +127,367 @@ async def custom_swagger_ui_html():
         oauth2_redirect_url="/docs/oauth2-redirect"
     )
 
-@app.get("/docs/oauth2-redirect", include_in_schema=False)
+@router.get("/docs/oauth2-redirect", include_in_schema=False)
 async def oauth2_redirect():
     return get_swagger_ui_oauth2_redirect_html()
 
-@app.get("/openapi.json", include_in_schema=False)
-async def openapi():
+@router.get("/openapi.json", include_in_schema=False)
+async def openapi(request: Request):
     return get_openapi(
         title="Personality Assessment API",
         version="1.0.0",
         description="Backend server for personality assessment application",
-        routes=app.routes
+        routes=request.app.routes
     )
 
-@app.get("/get-assessment/{user_identifier}")
+@router.get("/get-assessment/{user_identifier}")
 async def get_assessment(user_identifier: str):
     try:
-        assessment = db.assessments.find_one({"user_id": user_identifier})
+        assessment = assessment_cache.get(user_identifier)
         
-        if not assessment:
-            user = db.users.find_one(
-                {"name": user_identifier},
-                sort=[("created_at", -1)]
-            )
-            
-            if user:
-                assessment = db.assessments.find_one(
-                    {"user_id": str(user['_id'])},
-                    sort=[("assessment_date", -1)]
-                )
+        if assessment is None:
+            assessment = await run_db(find_latest_assessment, db, user_identifier)
+            if assessment is None:
+                assessment_cache.set(user_identifier, ASSESSMENT_NOT_FOUND, ttl=ASSESSMENT_NEGATIVE_TTL)
+            elif assessment.get("status") not in ACTIVE_STATUSES:
+                # Queued jobs are not cached, so polling sees them complete
+                assessment_cache.set(user_identifier, assessment)
         
-        if not assessment:
+        if assessment is ASSESSMENT_NOT_FOUND or assessment is None:
             raise HTTPException(status_code=404, detail="Assessment not found")
         
         return {
+            "status": assessment.get("status") or COMPLETED,
             "personality_result": assessment.get("personality_result", ""),
             "question_answers": assessment.get("question_answers", []),
             "image_answers": assessment.get("image_answers", [])
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching assessment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/health")
+@router.get("/assessment-jobs/{job_id}")
+async def get_assessment_job(job_id: str):
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        job = await run_db(
+            db.assessments.find_one, {"_id": ObjectId(job_id)},
+            {"status": 1, "personality_result": 1, "user_id": 1, "job_attempts": 1, "completed_at": 1}
+        )
+    except Exception as e:
+        print(f"Error fetching assessment job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "status": job.get("status") or COMPLETED,
+        "user_id": job.get("user_id"),
+        "attempts": job.get("job_attempts", 0),
+        "personality_result": job.get("personality_result"),
+        "completed_at": job["completed_at"].isoformat() if job.get("completed_at") else None
+    }
+
+@router.get("/api/admin/jobs")
+async def get_job_stats():
+    stats = await run_db(job_counts, db)
+    if job_pool is not None:
+        stats["pool"] = job_pool.stats()
+    return stats
+
+@router.get("/api/admin/write-behind")
+async def get_write_behind_stats():
+    if write_queue is None:
+        return {"enabled": False}
+    return dict(write_queue.stats(), enabled=True)
+
+@router.get("/api/admin/llm-coalescing")
+async def get_llm_coalescing_stats():
+    stats = llm_flights.stats()
+    if result_cache is not None:
+        stats["result_cache_hits"] = result_cache.hits
+        stats["result_cache_misses"] = result_cache.misses
+    return stats
+
+def collect_cache_metrics():
+    record_cache("assessment", assessment_cache.hits, assessment_cache.misses)
+    record_cache("user", hot_users.hits, hot_users.misses)
+    if result_cache is not None:
+        record_cache("result", result_cache.hits, result_cache.misses)
+    # A shared in-flight LLM call counts as a hit, a call actually made as a miss
+    record_cache("llm_coalescing", llm_flights.shared_hits, llm_flights.executions)
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+def collect_admission_metrics():
+    if admission is None:
+        return
+    stats = admission.stats()
+    ADMISSION_SLOTS.set(stats["active"], "active")
+    ADMISSION_SLOTS.set(stats["waiting"], "waiting")
+    ADMISSION_REJECTED.set_total(stats["rate_limited_total"], "rate_limited")
+    ADMISSION_REJECTED.set_total(stats["overloaded_total"], "overloaded")
+
+REGISTRY.add_collector(collect_admission_metrics)
+
+@router.get("/api/admin/admission")
+async def get_admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return dict(admission.stats(), enabled=True)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/health")
 async def health_check():
     return {"status": "healthy", "message": "Personality Assessment API is running"}
 
+# Background-refreshed dependency probes behind /readyz (see health.py)
+health_monitor = None
+
+@router.get("/livez", include_in_schema=False)
+async def liveness():
+    # Answering at all means the event loop is running; no dependency checks
+    return {"status": "alive"}
 
-# Add these new endpoints
-@app.get("/api/admin/analytics/users")
+@router.get("/readyz", include_in_schema=False)
+async def readiness():
+    if health_monitor is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    ready, details = health_monitor.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content=dict(details, status="ready" if ready else "not ready")
+    )
+
+
+# Analytics endpoints read the materialized rollups (see analytics_rollups.py)
+@router.get("/api/admin/analytics/users")
 async def get_user_analytics():
-    pipeline = [
-        {"$group": {
-            "_id": "$user_type",
-            "count": {"$sum": 1},
-            "last_week": {
-                "$sum": {"$cond": [{"$gte": ["$created_at", datetime.utcnow() - timedelta(days=7)]}, 1, 0]}
-            }
-        }},
-        {"$project": {
-            "userType": "$_id",
-            "total": "$count",
-            "lastWeek": "$last_week",
-            "_id": 0
-        }}
-    ]
-    return list(db.users.aggregate(pipeline))
-
-@app.get("/api/admin/analytics/assessments")
+    return await run_db(read_user_analytics, db)
+
+@router.get("/api/admin/analytics/assessments")
 async def get_assessment_analytics():
-    pipeline = [
-        {"$group": {
-            "_id": "$dominant_trait",
-            "count": {"$sum": 1},
-            "avg_answers": {"$avg": {"$size": "$question_answers"}}
-        }},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    return list(db.assessments.aggregate(pipeline))
-
-@app.get("/api/admin/analytics/feedback")
+    return await run_db(read_assessment_analytics, db)
+
+@router.get("/api/admin/analytics/feedback")
 async def get_feedback_analytics():
-    pipeline = [
-        {"$unwind": "$feedback_scores"},
-        {"$group": {
-            "_id": "$feedback_scores.k",
-            "avg": {"$avg": "$feedback_scores.v"},
-            "count": {"$sum": 1}
-        }},
-        {"$project": {
-            "question": "$_id",
-            "average": {"$round": ["$avg", 2]},
-            "responses": "$count",
-            "_id": 0
-        }}
-    ]
-    return list(db.feedback.aggregate(pipeline))
-@app.post("/submit-assessment")
-async def submit_assessment(assessment_data: AssessmentSubmission):
+    return await run_db(read_feedback_analytics, db)
+
+# Date-range trends in day/week/month buckets and CSV export of the raw
+# documents in a range (see range_analytics.py)
+AnalyticsSource = Path(..., pattern="^(assessments|feedback)$")
+
+def analytics_range(start: datetime, end: Optional[datetime]):
+    # Naive UTC throughout, like the stored timestamps
+    start = start.astimezone(timezone.utc).replace(tzinfo=None) if start.tzinfo else start
+    end = end or datetime.utcnow()
+    end = end.astimezone(timezone.utc).replace(tzinfo=None) if end.tzinfo else end
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+@router.get("/api/admin/analytics/{source}/series")
+async def get_analytics_series(source: str = AnalyticsSource, start: datetime = Query(...),
+                               end: Optional[datetime] = None,
+                               bucket: str = Query("day", pattern="^(day|week|month)$"),
+                               format: str = Query("json", pattern="^(json|csv)$"), cache: bool = True):
+    start, end = analytics_range(start, end)
     try:
-        if len(assessment_data.questionAnswers) != 6:
-            raise HTTPException(
-                status_code=400, 
-                detail="Exactly 6 question answers are required"
-            )
+        series = await run_db(bucket_series, db, source, bucket, start, end, use_cache=cache)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Analytics series error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if format == "csv":
+        return PlainTextResponse(series_csv(source, series), media_type="text/csv")
+    return FastJSONResponse(content=series)
+
+@router.get("/api/admin/analytics/{source}/export")
+async def export_analytics_range(source: str = AnalyticsSource, start: datetime = Query(...),
+                                 end: Optional[datetime] = None, columns: Optional[str] = None):
+    start, end = analytics_range(start, end)
+    columns = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    return export_range_csv(db, source, start, end, columns)
+
+async def update_rollup(record, *args):
+    # Rollups are best effort: a failed counter update must not fail the write
+    try:
+        await run_db(record, db, *args)
+    except Exception as e:
+        print(f"Analytics rollup error: {e}")
+
+# Users never change identity, so (name, user_type) -> id is cached, and
+# concurrent first submissions for the same user share one upsert
+hot_users = LRUTTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "600"))
+)
+user_upserts = SingleFlight()
+
+async def upsert_and_cache_user(user: UserData):
+    user_id, created = await run_db(upsert_user, db, user.name, user.userType, user.rollNumber)
+    if created is not None:
+        await update_rollup(record_user_created, created["user_type"], created["created_at"])
+    hot_users.set(user_key(user.name, user.userType), user_id)
+    return user_id
+
+async def resolve_user_id(user: UserData):
+    """
+    Look up the user by name and type, creating them if they do not exist
+
+    Returns:
+        str: The user's id
+    """
+    key = user_key(user.name, user.userType)
+    user_id = hot_users.get(key)
+    if user_id is not None:
+        return user_id
+    return await user_upserts.do(key, upsert_and_cache_user, user)
+
+def build_assessment_record(user_id: str, assessment_data: AssessmentSubmission, personality_result: str,
+                            llm_usage: Optional[dict] = None):
+    scores = TRAIT_SCORER.score(TRAIT_SCORER.encode([assessment_data.questionAnswers]))
+    record = {
+        "user_id": user_id,
+        "question_answers": assessment_data.questionAnswers,
+        "image_answers": assessment_data.imageAnswers,
+        "personality_result": personality_result,
+        "assessment_date": datetime.utcnow()
+    }
+    if llm_usage:
+        record["llm_usage"] = llm_usage
+        if needs_regeneration(llm_usage):
+            # Template or cut-off analysis; regeneration.py replaces it later
+            record["needs_regeneration"] = True
+    record.update(TRAIT_SCORER.document_fields(scores, 0))
+    return record
+
+# Optional write-behind queue for assessment and feedback inserts, started in
+# startup_event when WRITE_BEHIND_ENABLED=true (see write_behind.py)
+write_queue = None
+
+async def on_write_behind_flush(collection_name: str, documents: List[dict]):
+    if collection_name == "assessments":
+        await run_db(set_latest_assessments, db, documents)
+        await update_rollup(record_assessments, documents)
+    elif collection_name == "feedback":
+        await update_rollup(record_feedbacks, [document["feedback_scores"] for document in documents])
+
+async def store_assessment(assessment_record: dict, user_name: str, direct: bool = False):
+    if not direct and write_queue is not None and await write_queue.enqueue("assessments", assessment_record):
+        # Answer reads from the cache until the queued record is flushed
+        summary = latest_assessment_summary(assessment_record)
+        assessment_cache.set(assessment_record["user_id"], summary)
+        assessment_cache.set(user_name, summary)
+        return
+    await run_db(db.assessments.insert_one, assessment_record)
+    await run_db(set_latest_assessment, db, assessment_record["user_id"], assessment_record)
+    assessment_cache.invalidate(assessment_record["user_id"])
+    assessment_cache.invalidate(user_name)
+    await update_rollup(
+        record_assessment,
+        assessment_record["dominant_trait"],
+        len(assessment_record["question_answers"])
+    )
+
+# Admission control for the LLM-backed endpoints (see admission.py): a
+# per-process cap on concurrent LLM work with a bounded wait queue, plus
+# optional per-client token buckets. Rejections are 429/503 with Retry-After.
+admission = None
+
+async def enter_admission(request: Request, user: Optional[UserData] = None):
+    """
+    Take an LLM work slot or raise the matching 429/503 HTTPException
+
+    Returns:
+        slot for leave_admission (None when admission control is off)
+    """
+    if admission is None:
+        return None
+    try:
+        return await admission.enter(request, user)
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+async def check_rate_limit(request: Request, user: Optional[UserData] = None):
+    """Rate limit only; the caller takes work slots per LLM call with admission.enter_work"""
+    if admission is None:
+        return
+    try:
+        await admission.check_rate(request, user)
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+def admission_error(e: AdmissionRejected):
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def leave_admission(slot):
+    if slot is not None and admission is not None:
+        admission.leave(slot)
+
+@asynccontextmanager
+async def admitted(request: Request, user: Optional[UserData] = None):
+    slot = await enter_admission(request, user)
+    try:
+        yield
+    finally:
+        leave_admission(slot)
+
+# Deferred generation (?mode=async): the assessment is stored as a pending
+# job and generated by a JobWorkerPool, here or in another process (see
+# assessment_jobs.py); clients poll /assessment-jobs/{job_id} or /get-assessment
+job_pool = None
+
+def on_job_completed(job: dict, user: dict):
+    assessment_cache.invalidate(str(user["_id"]))
+    if user.get("name"):
+        assessment_cache.invalidate(user["name"])
+
+async def submit_assessment_job(assessment_data: AssessmentSubmission):
+    user_id = await resolve_user_id(assessment_data.user)
+    assessment_record = build_assessment_record(user_id, assessment_data, None)
+    assessment_record.update(job_fields(), _id=ObjectId())
+    # Never write-behind: a worker must be able to claim the job once its id is returned
+    await store_assessment(assessment_record, assessment_data.user.name, direct=True)
+    if job_pool is not None:
+        job_pool.notify()
+    job_id = str(assessment_record["_id"])
+    return JSONResponse(status_code=202, content={
+        "message": "Assessment accepted",
+        "job_id": job_id,
+        "user_id": user_id,
+        "status": PENDING,
+        "status_url": f"/assessment-jobs/{job_id}"
+    })
+
+VALID_OPTIONS = {"A", "B", "C", "D"}
+
+def validate_answers(question_answers: List[str]):
+    if len(question_answers) != 6:
+        return "Exactly 6 question answers are required"
+    if any(answer not in VALID_OPTIONS for answer in question_answers):
+        return f"Invalid option. Must be one of {sorted(VALID_OPTIONS)}"
+    return None
+
+@router.post("/submit-assessment")
+async def submit_assessment(assessment_data: AssessmentSubmission, request: Request,
+                            mode: str = Query("sync", pattern="^(sync|async)$")):
+    try:
+        error = validate_answers(assessment_data.questionAnswers)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
         
         mistral_api_key = os.getenv("MISTRAL_API_KEY")
         if not mistral_api_key:
@@ -205,38 +496,28 @@ async def submit_assessment(assessment_data: AssessmentSubmission):
                 detail="Mistral API key not configured"
             )
         
-        existing_user = db.users.find_one({
-            "name": assessment_data.user.name,
-            "user_type": assessment_data.user.userType
-        })
+        if mode == "async":
+            # No LLM work in the request, so no admission slot, but each job
+            # still spends the client's rate-limit token
+            await check_rate_limit(request, assessment_data.user)
+            return await submit_assessment_job(assessment_data)
         
-        if existing_user:
-            user_id = str(existing_user['_id'])
-        else:
-            user_data = {
-                "name": assessment_data.user.name,
-                "user_type": assessment_data.user.userType,
-                "roll_number": assessment_data.user.rollNumber,
-                "created_at": datetime.utcnow()
-            }
+        async with admitted(request, assessment_data.user):
+            user_id = await resolve_user_id(assessment_data.user)
             
-            user_result = db.users.insert_one(user_data)
-            user_id = str(user_result.inserted_id)
-        
-        personality_result = process_personality_assessment(
-            assessment_data.questionAnswers, 
-            mistral_api_key
-        )
+            llm_usage = {}
+            personality_result = await process_personality_assessment_async(
+                assessment_data.questionAnswers, 
+                mistral_api_key,
+                cache=result_cache,
+                client=get_llm_manager(),
+                flight=llm_flights,
+                usage=llm_usage
+            )
         
-        assessment_record = {
-            "user_id": user_id,
-            "question_answers": assessment_data.questionAnswers,
-            "image_answers": assessment_data.imageAnswers,
-            "personality_result": personality_result,
-            "assessment_date": datetime.utcnow()
-        }
+        assessment_record = build_assessment_record(user_id, assessment_data, personality_result, llm_usage)
         
-        db.assessments.insert_one(assessment_record)
+        await store_assessment(assessment_record, assessment_data.user.name)
         
         return {
             "message": "Assessment submitted successfully",
@@ -244,45 +525,284 @@ async def submit_assessment(assessment_data: AssessmentSubmission):
             "personality_result": personality_result
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Assessment submission error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Generation tasks outlive their streaming response so a client disconnect
+# never loses a result; shutdown waits for them to finish.
+background_tasks = set()
 
-@app.get("/api/admin/users")
-async def get_all_users():
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def stream_and_store_assessment(assessment_data: AssessmentSubmission, user_id: str,
+                                      api_key: str, events: asyncio.Queue):
+    options = assessment_data.questionAnswers
     try:
-        users = list(db.users.find({}, {"password": 0}))  # Exclude sensitive data
-        # Convert ObjectId to string
-        for user in users:
-            user['_id'] = str(user['_id'])
-        return users
+        cached = await result_cache.get(options) if result_cache is not None else None
+        if cached is not None:
+            personality_result = cached
+            llm_usage = reused_usage("cache")
+            events.put_nowait(("token", cached))
+        else:
+            assessment = PersonalityAssessment(api_key, client=get_llm_manager())
+            chunks = []
+            tokens = assessment.stream_personality(options)
+            personality_result = None
+            try:
+                # Hedge on the first token only; once text is flowing it is not cut off
+                first = anext(tokens)
+                token = await (asyncio.wait_for(first, LLM_LATENCY_BUDGET) if LLM_LATENCY_BUDGET > 0 else first)
+                while True:
+                    chunks.append(token)
+                    events.put_nowait(("token", token))
+                    token = await anext(tokens)
+            except StopAsyncIteration:
+                pass
+            except Exception as e:
+                if chunks:
+                    raise
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                print(f"Assessment stream {reason}, using fallback: {e!r}")
+                personality_result = fallback_analysis(options)
+                llm_usage = fallback_usage(reason)
+                events.put_nowait(("token", personality_result))
+            finally:
+                await tokens.aclose()
+            if personality_result is None:
+                personality_result = "".join(chunks)
+                llm_usage = assessment.usage
+                if result_cache is not None and not is_truncated(llm_usage):
+                    await result_cache.put(options, personality_result)
+
+        assessment_record = build_assessment_record(user_id, assessment_data, personality_result, llm_usage)
+        await store_assessment(assessment_record, assessment_data.user.name)
+        events.put_nowait(("done", {"message": "Assessment submitted successfully", "user_id": user_id}))
+    except Exception as e:
+        print(f"Assessment stream error: {e}")
+        events.put_nowait(("error", {"message": str(e)}))
+
+async def server_sent_events(events: asyncio.Queue):
+    while True:
+        event, payload = await events.get()
+        yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        if event != "token":
+            break
+
+@router.post("/submit-assessment/stream")
+async def submit_assessment_stream(assessment_data: AssessmentSubmission, request: Request):
+    error = validate_answers(assessment_data.questionAnswers)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    mistral_api_key = os.getenv("MISTRAL_API_KEY")
+    if not mistral_api_key:
+        raise HTTPException(
+            status_code=500, 
+            detail="Mistral API key not configured"
+        )
+    
+    slot = await enter_admission(request, assessment_data.user)
+    try:
+        user_id = await resolve_user_id(assessment_data.user)
     except Exception as e:
+        leave_admission(slot)
+        print(f"Assessment submission error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    events = asyncio.Queue()
+    # The slot is held by the generation task, which outlives the response
+    task = spawn_background(stream_and_store_assessment(assessment_data, user_id, mistral_api_key, events))
+    task.add_done_callback(lambda _: leave_admission(slot))
+    
+    return StreamingResponse(
+        server_sent_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.get("/api/admin/assessments")
-async def get_all_assessments():
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+@router.post("/submit-assessments/batch")
+async def submit_assessments_batch(batch: BatchAssessmentSubmission, request: Request):
+    """
+    Submit many assessments at once (kiosk / offline uploads). Users are
+    resolved with one query and one bulk upsert, identical answer sets are
+    generated once, and all assessments are stored with one insert_many.
+    Each submission gets its own ok/error entry in ``results``. The batch
+    spends one rate-limit token, and each distinct answer set takes its own
+    admission slot while it is generated (at most BATCH_LLM_CONCURRENCY at
+    a time), so a batch counts against the LLM work cap like that many
+    single submissions. Answer sets refused a slot get per-submission errors.
+    """
+    if len(batch.submissions) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"At most {BATCH_MAX_SIZE} submissions per batch"
+        )
+    
+    mistral_api_key = os.getenv("MISTRAL_API_KEY")
+    if not mistral_api_key:
+        raise HTTPException(
+            status_code=500, 
+            detail="Mistral API key not configured"
+        )
+    
+    await check_rate_limit(request)
+    return await process_batch(batch, mistral_api_key)
+
+async def process_batch(batch: BatchAssessmentSubmission, mistral_api_key: str):
+    results = [None] * len(batch.submissions)
+    valid = []
+    for index, submission in enumerate(batch.submissions):
+        error = validate_answers(submission.questionAnswers)
+        if error:
+            results[index] = {"index": index, "status": "error", "error": error}
+        else:
+            valid.append((index, submission))
+    
     try:
-        assessments = list(db.assessments.find())
-        # Convert ObjectId to string
-        for assessment in assessments:
-            assessment['_id'] = str(assessment['_id'])
-            assessment['user_id'] = str(assessment['user_id'])
-        return assessments
+        user_ids, created_users = await run_db(resolve_user_ids_bulk, db, [
+            (submission.user.name, submission.user.userType, submission.user.rollNumber)
+            for _, submission in valid
+        ])
     except Exception as e:
+        print(f"Batch user resolution error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if created_users:
+        await update_rollup(record_users_created, created_users)
+    for key, user_id in user_ids.items():
+        hot_users.set(key, user_id)
+    resolved = []
+    for index, submission in valid:
+        if user_key(submission.user.name, submission.user.userType) in user_ids:
+            resolved.append((index, submission))
+        else:
+            results[index] = {"index": index, "status": "error", "error": "Failed to resolve user"}
+    valid = resolved
+    
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    
+    usages = {}
+    
+    async def generate(answers: str):
+        async with semaphore:
+            slot = await admission.enter_work() if admission is not None else None
+            try:
+                return await generate_with_fallback(
+                    list(answers), mistral_api_key, cache=result_cache, client=get_llm_manager(),
+                    flight=llm_flights, usage=usages.setdefault(answers, {})
+                )
+            finally:
+                leave_admission(slot)
+    
+    distinct_answers = list({normalize_answers(submission.questionAnswers) for _, submission in valid})
+    outcomes = await asyncio.gather(*(generate(answers) for answers in distinct_answers), return_exceptions=True)
+    generated = dict(zip(distinct_answers, outcomes))
+    
+    records = []
+    charged = set()
+    for index, submission in valid:
+        outcome = generated[normalize_answers(submission.questionAnswers)]
+        if isinstance(outcome, BaseException):
+            results[index] = {"index": index, "status": "error", "error": f"Error processing personality assessment: {outcome}"}
+            continue
+        user_id = user_ids[user_key(submission.user.name, submission.user.userType)]
+        # Identical answer sets share one generation; its tokens are charged
+        # once, but every copy inherits its fallback / truncation status
+        answers = normalize_answers(submission.questionAnswers)
+        if answers in charged:
+            llm_usage = reused_usage("shared", usages[answers])
+        else:
+            charged.add(answers)
+            llm_usage = usages[answers]
+        records.append((index, submission, build_assessment_record(user_id, submission, outcome, llm_usage)))
+    
+    failed_positions = set()
+    if records:
+        try:
+            await run_db(db.assessments.insert_many, [record for _, _, record in records], ordered=False)
+        except BulkWriteError as e:
+            failed_positions = {error["index"] for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            print(f"Batch assessment insert error: {e}")
+            failed_positions = set(range(len(records)))
+    
+    stored = []
+    for position, (index, submission, record) in enumerate(records):
+        if position in failed_positions:
+            results[index] = {"index": index, "status": "error", "error": "Failed to store assessment"}
+            continue
+        stored.append(record)
+        assessment_cache.invalidate(record["user_id"])
+        assessment_cache.invalidate(submission.user.name)
+        results[index] = {
+            "index": index,
+            "status": "ok",
+            "user_id": record["user_id"],
+            "personality_result": record["personality_result"]
+        }
+    
+    if stored:
+        try:
+            await run_db(set_latest_assessments, db, stored)
+        except Exception as e:
+            print(f"Batch latest assessment update error: {e}")
+        await update_rollup(record_assessments, stored)
+    
+    return {
+        "message": "Batch processed",
+        "submitted": len(stored),
+        "failed": len(results) - len(stored),
+        "results": results
+    }
 
-@app.get("/api/admin/feedbacks")
-async def get_all_feedbacks():
+
+# Admin listings: keyset pagination (?limit=&after=, next cursor in the
+# X-Next-Cursor header), ?fields= projection and ?format=ndjson export
+ListingFormat = Query("json", pattern="^(json|ndjson)$")
+PageLimit = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+@router.get("/api/admin/users")
+async def get_all_users(limit: int = PageLimit, after: Optional[str] = None,
+                        fields: Optional[str] = None, format: str = ListingFormat):
     try:
-        feedbacks = list(db.feedback.find())
-        # Convert ObjectId to string
-        for feedback in feedbacks:
-            feedback['_id'] = str(feedback['_id'])
-        return feedbacks
+        # Exclude sensitive data and the denormalized latest_assessment copy
+        return await list_collection(db.users, limit, after, fields, format,
+                                     exclude=("password", "latest_assessment"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))# Corrected Feedback Endpoint
-@app.post("/submit-feedback")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/admin/assessments")
+async def get_all_assessments(limit: int = PageLimit, after: Optional[str] = None,
+                              fields: Optional[str] = None, format: str = ListingFormat):
+    try:
+        return await list_collection(db.assessments, limit, after, fields, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/admin/feedbacks")
+async def get_all_feedbacks(limit: int = PageLimit, after: Optional[str] = None,
+                            fields: Optional[str] = None, format: str = ListingFormat):
+    try:
+        return await list_collection(db.feedback, limit, after, fields, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Corrected Feedback Endpoint
+@router.post("/submit-feedback")
 async def submit_feedback(feedback_data: FeedbackSubmission):
     try:
         feedback_record = {
@@ -291,7 +811,9 @@ async def submit_feedback(feedback_data: FeedbackSubmission):
             "timestamp": datetime.utcnow()
         }
         
-        db.feedback.insert_one(feedback_record)
+        if write_queue is None or not await write_queue.enqueue("feedback", feedback_record):
+            await run_db(db.feedback.insert_one, feedback_record)
+            await update_rollup(record_feedback, feedback_record["feedback_scores"])
         
         return {
             "message": "Feedback submitted successfully"
@@ -301,7 +823,6 @@ async def submit_feedback(feedback_data: FeedbackSubmission):
         print(f"Feedback submission error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
@@ -309,21 +830,142 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": True,
             "status_code": exc.status_code,
             "message": exc.detail
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
-@app.on_event("startup")
-async def startup_event():
+REGENERATION_INTERVAL = float(os.getenv("REGENERATION_INTERVAL", "60"))
+
+async def regeneration_loop():
+    """
+    Periodically replace template fallback analyses with LLM ones, skipping
+    rounds while the LLM circuit is open
+    """
+    while True:
+        await asyncio.sleep(REGENERATION_INTERVAL)
+        manager = get_llm_manager()
+        if manager is None or manager.breaker.state == manager.breaker.OPEN:
+            continue
+        try:
+            users = await regenerate_pending(db, os.getenv("MISTRAL_API_KEY"), cache=result_cache,
+                                             client=manager, flight=llm_flights)
+        except Exception as e:
+            print(f"Regeneration error: {e}")
+            continue
+        for user in users:
+            assessment_cache.invalidate(str(user["_id"]))
+            if user.get("name"):
+                assessment_cache.invalidate(user["name"])
+        if users:
+            print(f"Regenerated {len(users)} fallback assessments")
+
+async def warm_up():
+    """
+    Ping Mongo, create indexes and prime caches before serving traffic
+    """
+    start = time.perf_counter()
+    await run_db(db.command, "ping")
+    print(f"MongoDB ping {1000 * (time.perf_counter() - start):.1f} ms")
+    if os.getenv("ENSURE_INDEXES", "true").lower() == "true":
+        await run_db(ensure_indexes, db)
+    if result_cache is not None:
+        warmed = await run_db(result_cache.warm, int(os.getenv("RESULT_CACHE_WARM", "4096")))
+        if warmed:
+            print(f"Result cache primed with {warmed} profiles")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db, result_cache, write_queue, health_monitor, admission, job_pool
     print("Personality Assessment API is starting up")
+    if db is None:
+        db = get_mongodb_connection()
+    if result_cache is None:
+        result_cache = build_result_cache(db, LLM_MODEL, PROMPT_VERSION)
+    start_llm_manager(os.getenv("MISTRAL_API_KEY"))
+    try:
+        # Bounded so an unreachable database cannot hold startup forever;
+        # requests then fail (and report) individually instead
+        await asyncio.wait_for(warm_up(), float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10")))
+    except Exception as e:
+        print(f"Startup warm-up error: {e!r}")
+    if os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true":
+        write_queue = WriteBehindQueue.from_env(lambda: db, on_flushed=on_write_behind_flush)
+        await write_queue.start()
+    if os.getenv("ADMISSION_ENABLED", "true").lower() == "true":
+        admission = AdmissionController.from_env()
+    health_monitor = HealthMonitor.from_env(lambda: db, get_llm_manager, lambda: write_queue)
+    health_monitor.start()
+    regeneration = asyncio.create_task(regeneration_loop()) if REGENERATION_INTERVAL > 0 else None
+    job_pool = JobWorkerPool.from_env(
+        lambda: db, os.getenv("MISTRAL_API_KEY"), cache=result_cache, client=get_llm_manager(),
+        flight=llm_flights, on_completed=on_job_completed
+    )
+    job_pool.start()
+
+    yield
 
-@app.on_event("shutdown")
-async def shutdown_event():
     print("Personality Assessment API is shutting down")
+    # Jobs in progress are handed back to the queue for other workers
+    await job_pool.close()
+    job_pool = None
+    if regeneration is not None:
+        regeneration.cancel()
+        await asyncio.gather(regeneration, return_exceptions=True)
+    await health_monitor.close()
+    health_monitor = None
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if write_queue is not None:
+        await write_queue.close()
+        write_queue = None
+    if admission is not None:
+        await admission.close()
+        admission = None
+    await close_llm_manager()
+    shutdown_db_executor()
+
+def create_app():
+    """
+    Build the FastAPI application; clients are created by its lifespan hook
+    """
+    application = FastAPI(
+        title="Personality Assessment API",
+        description="Backend server for personality assessment application",
+        version="1.0.0",
+        docs_url=None,
+        redoc_url=None,
+        lifespan=lifespan
+    )
+
+    # CORS Middleware Configuration
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"]
+    )
+    # Request latency histograms by route, served at /metrics
+    application.add_middleware(LatencyMiddleware)
+    application.add_exception_handler(HTTPException, http_exception_handler)
+    application.include_router(router)
+    return application
+
+app = create_app()
 
 if __name__ == "__main__":
+    # Production: SERVER_WORKERS processes, no reload. Development: SERVER_RELOAD=true
+    workers = int(os.getenv("SERVER_WORKERS", "1"))
+    reload = os.getenv("SERVER_RELOAD", "false").lower() == "true"
+    if workers > 1 and os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true":
+        print("Warning: write-behind workers share WRITE_BEHIND_SPILL_PATH; give each its own path")
+    if workers > 1 and os.getenv("ASSESSMENT_CACHE_TTL"):
+        print("Warning: /get-assessment caches are per worker; a new assessment may read as stale "
+              "on other workers for up to ASSESSMENT_CACHE_TTL seconds")
     uvicorn.run(
         "main:app", 
         host=os.getenv("SERVER_HOST", "0.0.0.0"), 
         port=int(os.getenv("SERVER_PORT", 8000)), 
-        reload=True
+        reload=reload,
+        workers=None if reload else workers,
+        log_level=os.getenv("SERVER_LOG_LEVEL", "info")
     )
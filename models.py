@@ -74,6 +74,12 @@ class FeedbackSubmission(BaseModel):
                 raise ValueError(f"Score for {key} must be between 1 and 5")
         
         return v
+
+# Feedback as stored: the submission plus who sent it and when
+class FeedbackModel(FeedbackSubmission):
+    userId: Optional[str] = None
+    submissionDate: datetime = Field(default_factory=datetime.utcnow)
+
 # MongoDB Document Models (for PyMongo)
 class MongoUserDocument:
     def __init__(self, user_data: UserBase):
@@ -1,70 +1,177 @@
+import asyncio
 import os
-from mistralai import Mistral  # Correct import
+
+from fallback_analysis import FALLBACK_VERSION, build_fallback_analysis
+from prompts import (
+    MAX_OUTPUT_TOKENS,
+    PROMPT_VERSION,
+    RETRY_MAX_TOKENS,
+    build_prompt,
+    combine_usage,
+    generation_params,
+    is_truncated,
+    token_usage
+)
+from result_cache import make_cache_key
+from trait_scoring import TraitScorer
+
+LLM_MODEL = "mistral-large-latest"
+# Seconds a request waits for the LLM before answering with the template
+# fallback (0 = wait for the LLM's own timeout and retries)
+LLM_LATENCY_BUDGET = float(os.getenv("LLM_LATENCY_BUDGET", "8"))
+
+
+def create_llm_client(api_key, async_client=None):
+    """
+    Build the chat client used for personality analysis.
+
+    Set LLM_PROVIDER=fake to use the local stub in fake_llm.py instead of Mistral,
+    or MISTRAL_SERVER_URL to point the real client at another endpoint.
+    Pass ``async_client`` to share a pooled httpx.AsyncClient across calls.
+    """
+    if os.getenv("LLM_PROVIDER", "mistral").lower() == "fake":
+        from fake_llm import FakeMistral
+        return FakeMistral.from_env()
+    # Imported here: the SDK takes about a second to import, which the
+    # offline tools and the fake provider never need
+    from mistralai import Mistral
+    return Mistral(
+        api_key=api_key,
+        server_url=os.getenv("MISTRAL_SERVER_URL") or None,
+        async_client=async_client
+    )
+
+
+PERSONALITY_TRAITS = {
+    '1': {'A': {'primary': 'Leader', 'subtrait': 'Fearless Finisher'},
+          'B': {'primary': 'Strategist', 'subtrait': 'Smart Planner'},
+          'C': {'primary': 'Empath', 'subtrait': 'Motivator Extraordinaire'},
+          'D': {'primary': 'Adventurer', 'subtrait': 'Risk-Taker Extraordinaire'}},
+    '2': {'A': {'primary': 'Adventurer', 'subtrait': 'Free Spirit'},
+          'B': {'primary': 'Strategist', 'subtrait': 'Practical Planner'},
+          'C': {'primary': 'Empath', 'subtrait': 'Heartfelt Negotiator'},
+          'D': {'primary': 'Leader', 'subtrait': 'Visionary Trailblazer'}},
+    '3': {'A': {'primary': 'Adventurer', 'subtrait': 'Thrill-Seeker'},
+          'B': {'primary': 'Strategist', 'subtrait': 'Master Planner'},
+          'C': {'primary': 'Empath', 'subtrait': 'Supportive Soul'},
+          'D': {'primary': 'Leader', 'subtrait': 'The Boss of Fun'}},
+    '4': {'A': {'primary': 'Leader', 'subtrait': 'Visionary Change-Maker'},
+          'B': {'primary': 'Strategist', 'subtrait': 'Practical Impact-Maker'},
+          'C': {'primary': 'Empath', 'subtrait': 'The People\'s Champion'},
+          'D': {'primary': 'Adventurer', 'subtrait': 'The Innovator'}},
+    '5': {'A': {'primary': 'Leader', 'subtrait': 'Ethical Boss'},
+          'B': {'primary': 'Empath', 'subtrait': 'Ride-or-Die Friend'},
+          'C': {'primary': 'Strategist', 'subtrait': 'Clever Fixer'},
+          'D': {'primary': 'Adventurer', 'subtrait': 'Carefree Rebel'}},
+    '6': {'A': {'primary': 'Leader', 'subtrait': 'The Unstoppable'},
+          'B': {'primary': 'Strategist', 'subtrait': 'The Game Changer'},
+          'C': {'primary': 'Empath', 'subtrait': 'The Emotional Anchor'},
+          'D': {'primary': 'Adventurer', 'subtrait': 'The Rule-Breaker'}}
+}
+
+
+def select_traits(selected_options):
+    if len(selected_options) != 6:
+        raise ValueError("Exactly 6 options must be provided.")
+
+    return [
+        PERSONALITY_TRAITS[str(i+1)][opt]
+        for i, opt in enumerate(selected_options)
+    ]
+
+
+TRAIT_SCORER = TraitScorer(PERSONALITY_TRAITS)
+
+
+def compute_dominant_trait(selected_options):
+    """
+    Most frequent primary; ties go to the primary chosen earliest (see trait_scoring.py)
+    """
+    return TRAIT_SCORER.score_answers(selected_options)["dominant_trait"]
+
 
 class PersonalityAssessment:
-    def __init__(self, api_key):
-        self.client = Mistral(api_key=api_key)
-        self.personality_traits = {
-            '1': {'A': {'primary': 'Leader', 'subtrait': 'Fearless Finisher'},
-                  'B': {'primary': 'Strategist', 'subtrait': 'Smart Planner'},
-                  'C': {'primary': 'Empath', 'subtrait': 'Motivator Extraordinaire'},
-                  'D': {'primary': 'Adventurer', 'subtrait': 'Risk-Taker Extraordinaire'}},
-            '2': {'A': {'primary': 'Adventurer', 'subtrait': 'Free Spirit'},
-                  'B': {'primary': 'Strategist', 'subtrait': 'Practical Planner'},
-                  'C': {'primary': 'Empath', 'subtrait': 'Heartfelt Negotiator'},
-                  'D': {'primary': 'Leader', 'subtrait': 'Visionary Trailblazer'}},
-            '3': {'A': {'primary': 'Adventurer', 'subtrait': 'Thrill-Seeker'},
-                  'B': {'primary': 'Strategist', 'subtrait': 'Master Planner'},
-                  'C': {'primary': 'Empath', 'subtrait': 'Supportive Soul'},
-                  'D': {'primary': 'Leader', 'subtrait': 'The Boss of Fun'}},
-            '4': {'A': {'primary': 'Leader', 'subtrait': 'Visionary Change-Maker'},
-                  'B': {'primary': 'Strategist', 'subtrait': 'Practical Impact-Maker'},
-                  'C': {'primary': 'Empath', 'subtrait': 'The People\'s Champion'},
-                  'D': {'primary': 'Adventurer', 'subtrait': 'The Innovator'}},
-            '5': {'A': {'primary': 'Leader', 'subtrait': 'Ethical Boss'},
-                  'B': {'primary': 'Empath', 'subtrait': 'Ride-or-Die Friend'},
-                  'C': {'primary': 'Strategist', 'subtrait': 'Clever Fixer'},
-                  'D': {'primary': 'Adventurer', 'subtrait': 'Carefree Rebel'}},
-            '6': {'A': {'primary': 'Leader', 'subtrait': 'The Unstoppable'},
-                  'B': {'primary': 'Strategist', 'subtrait': 'The Game Changer'},
-                  'C': {'primary': 'Empath', 'subtrait': 'The Emotional Anchor'},
-                  'D': {'primary': 'Adventurer', 'subtrait': 'The Rule-Breaker'}}
-        }
+    def __init__(self, api_key, client=None, prompt_version=PROMPT_VERSION):
+        self.client = client if client is not None else create_llm_client(api_key)
+        self.personality_traits = PERSONALITY_TRAITS
+        self.prompt_version = prompt_version
+        # Token accounting for the last call (see prompts.token_usage)
+        self.usage = None
+
+    def build_prompt(self, selected_options):
+        return build_prompt(
+            select_traits(selected_options),
+            compute_dominant_trait(selected_options),
+            self.prompt_version
+        )
 
     def process_personality(self, selected_options):
-        if len(selected_options) != 6:
-            raise ValueError("Exactly 6 options must be provided.")
+        prompt = self.build_prompt(selected_options)
 
-        selected_traits = [
-            self.personality_traits[str(i+1)][opt]
-            for i, opt in enumerate(selected_options)
-        ]
+        response = self.client.chat.complete(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            **generation_params()
+        )
 
-        trait_counts = {}
-        for trait in selected_traits:
-            primary = trait['primary']
-            trait_counts[primary] = trait_counts.get(primary, 0) + 1
+        self.usage = token_usage(response, self.prompt_version)
+        return response.choices[0].message.content
 
-        dominant_trait = max(trait_counts, key=trait_counts.get)
+    async def process_personality_async(self, selected_options, max_tokens=MAX_OUTPUT_TOKENS):
+        prompt = self.build_prompt(selected_options)
 
-        prompt = f"""
-        Analyze personality profile:
-        Dominant Trait: {dominant_trait}
-        Detailed Traits: {selected_traits}
+        response = await self.client.chat.complete_async(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            **generation_params(max_tokens)
+        )
 
-        Generate a concise two-paragraph analysis directly addressing the person:
-        - First paragraph about their personality in a conversational, intimate tone
-        - Second paragraph about career paths, speaking directly to them
+        self.usage = token_usage(response, self.prompt_version, max_tokens)
+        return response.choices[0].message.content
 
-        Avoid headings, subheadings. Write as if you're speaking to them personally.
+    async def process_complete_async(self, selected_options):
         """
+        process_personality_async, retried once with RETRY_MAX_TOKENS when
+        the cap cut the analysis off; check ``is_truncated(self.usage)``
+        before caching the result
+        """
+        result = await self.process_personality_async(selected_options)
+        if is_truncated(self.usage) and RETRY_MAX_TOKENS > MAX_OUTPUT_TOKENS:
+            first = self.usage
+            result = await self.process_personality_async(selected_options, RETRY_MAX_TOKENS)
+            self.usage = combine_usage(first, self.usage)
+        return result
 
-        response = self.client.chat.complete(
-            model="mistral-large-latest",
-            messages=[{"role": "user", "content": prompt}]
+    async def stream_personality(self, selected_options):
+        """
+        Yield the analysis text chunk by chunk as the model generates it
+        """
+        prompt = self.build_prompt(selected_options)
+
+        events = await self.client.chat.stream_async(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            **generation_params()
         )
 
-        return response.choices[0].message.content
+        async for event in events:
+            # Providers report usage (and the finish reason) on the final chunk
+            if getattr(event.data, "usage", None) is not None:
+                self.usage = token_usage(event.data, self.prompt_version)
+            delta = event.data.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def fallback_analysis(options):
+    return build_fallback_analysis(select_traits(options), compute_dominant_trait(options))
+
+
+def fallback_usage(reason):
+    """Token accounting for a template fallback; ``reason`` is "timeout" or "error" """
+    return {"source": "fallback", "reason": reason, "fallback_version": FALLBACK_VERSION,
+            "prompt_version": PROMPT_VERSION, "prompt_tokens": 0, "completion_tokens": 0,
+            "total_tokens": 0}
 
 
 def process_personality_assessment(options, api_key):
@@ -72,8 +179,119 @@ def process_personality_assessment(options, api_key):
         assessment = PersonalityAssessment(api_key)
         return assessment.process_personality(options)
     except Exception as e:
-        print(f"Error processing personality assessment: {e}")
-        return f"Error processing personality assessment: {str(e)}"
+        print(f"Error processing personality assessment, using fallback: {e}")
+        return fallback_analysis(options)
+
+
+def needs_regeneration(llm_usage):
+    """Template fallback, or an analysis the token cap cut off, whoever paid for it"""
+    if not llm_usage:
+        return False
+    return "fallback" in (llm_usage.get("source"), llm_usage.get("generated_by")) or is_truncated(llm_usage)
+
+
+def reused_usage(source, generated=None):
+    """
+    Token accounting for a result this request did not pay for ("cache" or
+    "shared"). ``generated`` is the usage of the call that produced the
+    text; its source and finish reason are kept so a shared fallback or
+    cut-off analysis is regenerated on every record holding it.
+    """
+    usage = {"source": source, "prompt_version": PROMPT_VERSION, "prompt_tokens": 0,
+             "completion_tokens": 0, "total_tokens": 0}
+    if generated:
+        usage["generated_by"] = generated.get("source")
+        if generated.get("finish_reason"):
+            usage["finish_reason"] = generated["finish_reason"]
+    return usage
+
+
+async def generate_personality_result(options, api_key, cache=None, client=None, flight=None,
+                                      usage=None):
+    """
+    Return the analysis for ``options``, from ``cache`` when possible; raises on failure.
+    With a SingleFlight ``flight``, concurrent calls for the same answers share one LLM call.
+    Pass a dict as ``usage`` to have it filled with this request's token accounting.
+    """
+    if usage is None:
+        usage = {}
+    if cache is not None:
+        cached = await cache.get(options)
+        if cached is not None:
+            usage.update(reused_usage("cache"))
+            return cached
+
+    async def generate():
+        assessment = PersonalityAssessment(api_key, client=client)
+        result = await assessment.process_complete_async(options)
+        # Only the caller whose call ran gets here; coalesced callers get "shared"
+        usage.update(assessment.usage)
+        # A cut-off analysis is served once, never to everyone with these answers
+        if cache is not None and not is_truncated(assessment.usage):
+            await cache.put(options, result)
+        return result, assessment.usage
+
+    if flight is None:
+        result, _ = await generate()
+        return result
+    result, generated = await flight.do(make_cache_key(options, LLM_MODEL, PROMPT_VERSION), generate)
+    if usage.get("source") != "llm":
+        usage.update(reused_usage("shared", generated))
+    return result
+
+
+# LLM calls that outlived their request's budget; kept referenced until they
+# finish and fill the result cache
+late_generations = set()
+
+
+def _finish_late_generation(task):
+    late_generations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Late personality generation failed: {task.exception()}")
+
+
+async def generate_with_fallback(options, api_key, cache=None, client=None, flight=None, usage=None,
+                                 budget=None):
+    """
+    generate_personality_result with a hedge: for valid answers (see
+    main.validate_answers) it never raises, and after
+    ``budget`` seconds (default LLM_LATENCY_BUDGET) or on an LLM error
+    returns the template analysis instead, with ``usage`` source "fallback".
+    A call still running at the deadline is left to finish in the
+    background so its result lands in the cache for regeneration.
+    """
+    budget = LLM_LATENCY_BUDGET if budget is None else budget
+    if usage is None:
+        usage = {}
+    # The late call must not touch ``usage`` once the fallback has been recorded
+    llm_usage = {}
+    generation = asyncio.ensure_future(
+        generate_personality_result(options, api_key, cache, client, flight, llm_usage)
+    )
+    try:
+        if budget > 0:
+            result = await asyncio.wait_for(asyncio.shield(generation), budget)
+        else:
+            result = await generation
+        usage.update(llm_usage)
+        return result
+    except asyncio.TimeoutError:
+        print(f"LLM exceeded the {budget}s latency budget, using fallback")
+        usage.update(fallback_usage("timeout"))
+    except Exception as e:
+        print(f"Error processing personality assessment, using fallback: {e}")
+        usage.update(fallback_usage("error"))
+    finally:
+        if not generation.done():
+            late_generations.add(generation)
+            generation.add_done_callback(_finish_late_generation)
+    return fallback_analysis(options)
+
+
+async def process_personality_assessment_async(options, api_key, cache=None, client=None, flight=None,
+                                               usage=None):
+    return await generate_with_fallback(options, api_key, cache, client, flight, usage)
 
 
 if __name__ == "__main__":
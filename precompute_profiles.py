@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import get_mongodb_connection, run_db, shutdown_db_executor
+from personality_processing import LLM_MODEL, PROMPT_VERSION, PersonalityAssessment
+from prompts import is_truncated
+from result_cache import MongoResultStore, make_cache_key, normalize_answers
+
+# Offline warm-up job: generates the analysis for every answer combination and
+# stores it in the shared result-cache collection, which /submit-assessment
+# reads when RESULT_CACHE_MONGO=true. Keys already holding enough variants are
+# skipped, so an interrupted run resumes where it left off.
+
+
+def enumerate_answer_combinations(personality_traits):
+    questions = sorted(personality_traits, key=int)
+    options = [sorted(personality_traits[question]) for question in questions]
+    return [list(combination) for combination in itertools.product(*options)]
+
+
+class RateLimiter:
+    """
+    Spaces call starts at least ``1 / rate`` seconds apart across all tasks
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def existing_variant_counts(store):
+    counts = {}
+    for document in store.collection.find(
+        {"prompt_version": PROMPT_VERSION, "model": LLM_MODEL},
+        {"variants": 1}
+    ):
+        counts[document["_id"]] = len(document.get("variants", []))
+    return counts
+
+
+async def precompute(args):
+    db = get_mongodb_connection()
+    store = MongoResultStore(db[args.collection])
+    assessment = PersonalityAssessment(os.getenv("MISTRAL_API_KEY"))
+
+    counts = await run_db(existing_variant_counts, store)
+    pending = []
+    for options in enumerate_answer_combinations(assessment.personality_traits):
+        missing = args.variants - counts.get(make_cache_key(options, LLM_MODEL, PROMPT_VERSION), 0)
+        pending.extend([options] * max(0, missing))
+
+    total = len(pending)
+    print(f"{total} generations pending ({len(counts)} keys already stored)")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limiter = RateLimiter(args.rate)
+    done = 0
+    failed = 0
+    started = time.monotonic()
+
+    async def generate(options):
+        nonlocal done, failed
+        async with semaphore:
+            await limiter.wait()
+            try:
+                call = PersonalityAssessment(None, client=assessment.client)
+                text = await call.process_complete_async(options)
+                if is_truncated(call.usage):
+                    raise ValueError("analysis cut off by the token cap")
+                await run_db(
+                    store.add_variant,
+                    make_cache_key(options, LLM_MODEL, PROMPT_VERSION),
+                    text,
+                    args.variants,
+                    {"model": LLM_MODEL, "prompt_version": PROMPT_VERSION,
+                     "answers": normalize_answers(options)}
+                )
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"Failed to generate {normalize_answers(options)}: {e}")
+
+            if (done + failed) % args.progress_every == 0 or done + failed == total:
+                elapsed = time.monotonic() - started
+                print(f"{done + failed}/{total} processed, {failed} failed, "
+                      f"{done / elapsed if elapsed else 0:.1f} generations/s")
+
+    await asyncio.gather(*(generate(options) for options in pending))
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute personality analyses for all answer combinations")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum LLM calls in flight")
+    parser.add_argument("--rate", type=float, default=4.0, help="Maximum LLM calls started per second (0 = unlimited)")
+    parser.add_argument("--variants", type=int, default=int(os.getenv("RESULT_CACHE_VARIANTS", "1")),
+                        help="Number of variants to store per answer combination")
+    parser.add_argument("--collection", default=os.getenv("RESULT_CACHE_COLLECTION", "personality_profiles"))
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--fake-llm", action="store_true", help="Use the local stub LLM from fake_llm.py")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.fake_llm:
+        os.environ["LLM_PROVIDER"] = "fake"
+    try:
+        failures = asyncio.run(precompute(args))
+    finally:
+        shutdown_db_executor()
+    raise SystemExit(1 if failures else 0)
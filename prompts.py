@@ -0,0 +1,98 @@
+import os
+
+# Versioned prompt templates for the personality analysis. The version is
+# part of every result cache key, so add a new entry (never edit one in
+# place) when the wording changes. PROMPT_VERSION selects the template;
+# LLM_MAX_TOKENS caps the generated analysis (0 = provider default).
+#
+# The cap bounds cost and latency, but an analysis that hits it is cut off
+# mid-sentence (finish_reason "length"). Such a completion is retried once
+# with LLM_RETRY_MAX_TOKENS (default twice the cap) and is never written to
+# the result cache; one that is still cut off is stored for that user only
+# and marked for regeneration.
+#
+# v1 is the original prompt: the selected traits as a Python repr of six
+#    dicts, indented like the source it lived in.
+# v2 groups subtraits under their primary trait and drops the whitespace,
+#    for less than half the input tokens.
+
+PROMPT_TEMPLATES = {
+    "v1": """
+        Analyze personality profile:
+        Dominant Trait: {dominant_trait}
+        Detailed Traits: {traits}
+
+        Generate a concise two-paragraph analysis directly addressing the person:
+        - First paragraph about their personality in a conversational, intimate tone
+        - Second paragraph about career paths, speaking directly to them
+
+        Avoid headings, subheadings. Write as if you're speaking to them personally.
+        """,
+    "v2": (
+        "Personality profile. Dominant: {dominant_trait}. Traits: {traits}.\n"
+        "Write two concise paragraphs addressed to the person as \"you\", no headings: "
+        "1) their personality, warm and conversational; 2) career paths that suit them."
+    ),
+}
+
+PROMPT_VERSION = os.getenv("PROMPT_VERSION", "v2")
+MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "400"))
+RETRY_MAX_TOKENS = int(os.getenv("LLM_RETRY_MAX_TOKENS", str(2 * MAX_OUTPUT_TOKENS)))
+
+if PROMPT_VERSION not in PROMPT_TEMPLATES:
+    raise ValueError(f"Unknown PROMPT_VERSION {PROMPT_VERSION!r}; expected one of {sorted(PROMPT_TEMPLATES)}")
+
+
+def encode_traits(selected_traits):
+    """
+    Compact trait encoding: subtraits grouped under their primary, primaries
+    in order of first appearance, e.g. "Leader: Fearless Finisher, Ethical Boss; Empath: ..."
+    """
+    grouped = {}
+    for trait in selected_traits:
+        grouped.setdefault(trait["primary"], []).append(trait["subtrait"])
+    return "; ".join(f"{primary}: {', '.join(subtraits)}" for primary, subtraits in grouped.items())
+
+
+def build_prompt(selected_traits, dominant_trait, version=PROMPT_VERSION):
+    traits = selected_traits if version == "v1" else encode_traits(selected_traits)
+    return PROMPT_TEMPLATES[version].format(dominant_trait=dominant_trait, traits=traits)
+
+
+def generation_params(max_tokens=MAX_OUTPUT_TOKENS):
+    """Extra keyword arguments for chat.complete / chat.stream"""
+    return {"max_tokens": max_tokens} if max_tokens > 0 else {}
+
+
+def token_usage(response, version=PROMPT_VERSION, max_tokens=MAX_OUTPUT_TOKENS):
+    """
+    Token accounting for one LLM response, as stored on the assessment
+
+    Returns:
+        dict: provider token counts, finish reason, prompt version and cap
+    """
+    usage = getattr(response, "usage", None)
+    choices = getattr(response, "choices", None) or [None]
+    return {
+        "source": "llm",
+        "prompt_version": version,
+        "max_tokens": max_tokens or None,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+        "finish_reason": getattr(choices[0], "finish_reason", None)
+    }
+
+
+def is_truncated(usage):
+    """True when the completion stopped at the max_tokens cap"""
+    return bool(usage) and usage.get("finish_reason") == "length"
+
+
+def combine_usage(first, retry):
+    """Token accounting for a truncated call plus its retry; the retry's finish reason wins"""
+    combined = dict(retry, retries=first.get("retries", 0) + 1)
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        if first.get(key) is not None or retry.get(key) is not None:
+            combined[key] = (first.get(key) or 0) + (retry.get(key) or 0)
+    return combined
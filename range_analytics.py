@@ -0,0 +1,321 @@
+import argparse
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
+from pymongo import ASCENDING, UpdateOne
+
+from admin_listing import EXPORT_BATCH_SIZE, dumps
+from analytics_rollups import _is_field_name
+from database import get_mongodb_connection, run_db
+
+# Date-range analytics over assessments (assessment_date) and feedback
+# (timestamp) in day, week (ISO, Monday) or month buckets, all UTC. Each
+# bucket is computed by a server-side $group over the indexed time field,
+# so a response costs one aggregation returning (buckets x groups) rows no
+# matter how many documents fall in the range. Buckets that closed more
+# than ANALYTICS_CLOSE_GRACE seconds ago (covering write-behind lag) never
+# change again and are cached in the analytics_buckets collection; only
+# the open bucket and uncached history are aggregated. After rewriting
+# historical documents (e.g. backfill_scores.py changing dominant_trait) run
+# "python range_analytics.py clear --source assessments" so the cached
+# buckets are recomputed on the next request. Requested ranges are
+# widened to whole buckets. The bucket expressions avoid $dateTrunc so they
+# run on MongoDB 4.x as well.
+#
+# Raw documents in a range are exported as CSV, streamed in batches of
+# EXPORT_BATCH_SIZE by (time field, _id) keyset on the same index, so
+# memory stays flat for any export size.
+
+BUCKET_COLLECTION = "analytics_buckets"
+BUCKET_UNITS = ("day", "week", "month")
+BUCKET_CACHE_VERSION = 1
+CLOSE_GRACE = timedelta(seconds=float(os.getenv("ANALYTICS_CLOSE_GRACE", "300")))
+MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "1000"))
+# A Monday; week buckets are whole weeks counted from it
+WEEK_ANCHOR = datetime(1970, 1, 5)
+WEEK_MS = 7 * 24 * 3600 * 1000
+
+SOURCES = {
+    "assessments": {
+        "collection": "assessments",
+        "time_field": "assessment_date",
+        "columns": ("_id", "user_id", "assessment_date", "dominant_trait", "question_answers", "status"),
+    },
+    "feedback": {
+        "collection": "feedback",
+        "time_field": "timestamp",
+        "columns": ("_id", "timestamp", "feedback_scores", "additional_comments"),
+    },
+}
+
+
+def bucket_start(moment, unit):
+    if unit == "day":
+        return datetime(moment.year, moment.month, moment.day)
+    if unit == "week":
+        day = datetime(moment.year, moment.month, moment.day)
+        return day - timedelta(days=day.weekday())
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_bucket(start, unit):
+    if unit == "day":
+        return start + timedelta(days=1)
+    if unit == "week":
+        return start + timedelta(days=7)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def bucket_range(start, end, unit):
+    """
+    Returns:
+        list: bucket start datetimes covering [start, end), widened to whole buckets
+    """
+    buckets = []
+    current = bucket_start(start, unit)
+    while current < end:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Range spans more than {MAX_BUCKETS} {unit} buckets")
+        current = next_bucket(current, unit)
+    return buckets
+
+
+def bucket_expression(field, unit):
+    """Aggregation expression mapping ``$field`` to the start of its bucket"""
+    date = f"${field}"
+    if unit == "week":
+        return {"$subtract": [date, {"$mod": [{"$subtract": [date, WEEK_ANCHOR]}, WEEK_MS]}]}
+    parts = {"year": {"$year": date}, "month": {"$month": date}, "day": 1}
+    if unit == "day":
+        parts["day"] = {"$dayOfMonth": date}
+    return {"$dateFromParts": parts}
+
+
+def aggregate_assessments(db, start, end, unit):
+    """
+    Returns:
+        dict: bucket start -> {"count", "dominant_traits": {trait: count}}
+    """
+    rows = {}
+    for row in db.assessments.aggregate([
+        {"$match": {"assessment_date": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"bucket": bucket_expression("assessment_date", unit), "trait": "$dominant_trait"},
+            "count": {"$sum": 1}
+        }}
+    ]):
+        bucket = rows.setdefault(row["_id"]["bucket"], {"count": 0, "dominant_traits": {}})
+        bucket["count"] += row["count"]
+        trait = row["_id"].get("trait")
+        if trait:
+            bucket["dominant_traits"][trait] = row["count"]
+    return rows
+
+
+def aggregate_feedback(db, start, end, unit):
+    """
+    Returns:
+        dict: bucket start -> {"count", "scores": {key: {"average", "responses"}}}
+    """
+    match = {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+    bucket = bucket_expression("timestamp", unit)
+    rows = {}
+    for row in db.feedback.aggregate([match, {"$group": {"_id": bucket, "count": {"$sum": 1}}}]):
+        rows[row["_id"]] = {"count": row["count"], "scores": {}}
+    for row in db.feedback.aggregate([
+        match,
+        {"$project": {"bucket": bucket, "score": {"$objectToArray": "$feedback_scores"}}},
+        {"$unwind": "$score"},
+        {"$group": {
+            "_id": {"bucket": "$bucket", "key": "$score.k"},
+            "sum": {"$sum": "$score.v"},
+            "count": {"$sum": 1}
+        }}
+    ]):
+        if not _is_field_name(row["_id"]["key"]):
+            continue
+        scores = rows.setdefault(row["_id"]["bucket"], {"count": 0, "scores": {}})["scores"]
+        scores[row["_id"]["key"]] = {"average": round(row["sum"] / row["count"], 2), "responses": row["count"]}
+    return rows
+
+
+AGGREGATORS = {"assessments": aggregate_assessments, "feedback": aggregate_feedback}
+
+
+def empty_bucket(source):
+    return {"count": 0, "dominant_traits": {}} if source == "assessments" else {"count": 0, "scores": {}}
+
+
+def _cache_key(source, unit, start):
+    return f"{source}:{unit}:{start.isoformat()}"
+
+
+def bucket_series(db, source, unit, start, end, now=None, use_cache=True):
+    """
+    Per-bucket figures for ``source`` between ``start`` and ``end``
+
+    Returns:
+        dict: unit, range actually covered, buckets (oldest first, empty ones
+        included) and how many came from the closed-bucket cache
+    """
+    now = now or datetime.utcnow()
+    buckets = bucket_range(start, end, unit)
+    if not buckets:
+        return {"unit": unit, "start": start, "end": end, "cached_buckets": 0, "buckets": []}
+    bounds = {bucket: next_bucket(bucket, unit) for bucket in buckets}
+    closed = {bucket for bucket in buckets if bounds[bucket] <= now - CLOSE_GRACE}
+
+    values = {}
+    if use_cache and closed:
+        for document in db[BUCKET_COLLECTION].find({
+            "_id": {"$in": [_cache_key(source, unit, bucket) for bucket in closed]},
+            "version": BUCKET_CACHE_VERSION
+        }):
+            values[document["bucket"]] = document["value"]
+    cached = len(values)
+
+    missing = [bucket for bucket in buckets if bucket not in values]
+    if missing:
+        computed = AGGREGATORS[source](db, missing[0], bounds[missing[-1]], unit)
+        fresh = []
+        for bucket in missing:
+            values[bucket] = computed.get(bucket) or empty_bucket(source)
+            if bucket in closed:
+                fresh.append(bucket)
+        if use_cache and fresh:
+            db[BUCKET_COLLECTION].bulk_write([
+                UpdateOne(
+                    {"_id": _cache_key(source, unit, bucket)},
+                    {"$set": {"source": source, "unit": unit, "bucket": bucket, "value": values[bucket],
+                              "version": BUCKET_CACHE_VERSION, "computed_at": now}},
+                    upsert=True
+                )
+                for bucket in fresh
+            ], ordered=False)
+
+    return {
+        "unit": unit,
+        "start": buckets[0],
+        "end": bounds[buckets[-1]],
+        "cached_buckets": cached,
+        "buckets": [
+            dict(values[bucket], bucket=bucket, closed=bucket in closed)
+            for bucket in buckets
+        ]
+    }
+
+
+def clear_bucket_cache(db, source=None, unit=None):
+    """
+    Drop cached closed buckets (all, or one source / unit); the next
+    series request recomputes them from the raw documents
+
+    Returns:
+        int: number of cached buckets removed
+    """
+    query = {}
+    if source:
+        query["source"] = source
+    if unit:
+        query["unit"] = unit
+    return db[BUCKET_COLLECTION].delete_many(query).deleted_count
+
+
+def series_csv(source, series):
+    """One row per bucket; the per-trait or per-question figures become columns"""
+    rows = series["buckets"]
+    if source == "assessments":
+        keys = sorted({trait for row in rows for trait in row["dominant_traits"]})
+        header = ["bucket", "count"] + keys
+        lines = ([row["bucket"].isoformat(), row["count"]] + [row["dominant_traits"].get(key, 0) for key in keys]
+                 for row in rows)
+    else:
+        keys = sorted({key for row in rows for key in row["scores"]})
+        header = ["bucket", "count"] + [f"{key}_{stat}" for key in keys for stat in ("average", "responses")]
+        lines = ([row["bucket"].isoformat(), row["count"]]
+                 + [row["scores"].get(key, {}).get(stat, "") for key in keys for stat in ("average", "responses")]
+                 for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(lines)
+    return buffer.getvalue()
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode("utf-8")
+    return str(value)
+
+
+def _lookup(document, path):
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def fetch_range_batch(collection, time_field, start, end, after, limit, projection):
+    """``after`` is the (time, _id) of the last document already sent"""
+    query = {time_field: {"$gte": start, "$lt": end}}
+    if after is not None:
+        last_time, last_id = after
+        query = {"$or": [
+            {time_field: {"$gt": last_time, "$lt": end}},
+            {time_field: last_time, "_id": {"$gt": last_id}}
+        ]}
+    cursor = collection.find(query, projection).sort([(time_field, ASCENDING), ("_id", ASCENDING)])
+    return list(cursor.limit(limit))
+
+
+async def iter_csv(collection, time_field, start, end, columns, batch_size=EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    projection = {column.split(".")[0]: 1 for column in columns}
+    projection[time_field] = 1
+    after = None
+    while True:
+        batch = await run_db(fetch_range_batch, collection, time_field, start, end, after, batch_size, projection)
+        writer.writerows([_cell(_lookup(document, column)) for column in columns] for document in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if len(batch) < batch_size:
+            break
+        after = (batch[-1][time_field], batch[-1]["_id"])
+
+
+def export_range_csv(db, source, start, end, columns=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream the documents of ``source`` with a time field in [start, end) as
+    CSV; ``columns`` are dotted paths (default SOURCES[source]["columns"])
+    """
+    spec = SOURCES[source]
+    columns = tuple(columns or spec["columns"])
+    return StreamingResponse(
+        iter_csv(db[spec["collection"]], spec["time_field"], start, end, columns, batch_size),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{source}.csv"'}
+    )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Maintain the cached range analytics buckets")
+    parser.add_argument("command", choices=["clear"])
+    parser.add_argument("--source", choices=sorted(SOURCES), help="Only this source (default all)")
+    parser.add_argument("--unit", choices=BUCKET_UNITS, help="Only this bucket unit (default all)")
+    args = parser.parse_args()
+    removed = clear_bucket_cache(get_mongodb_connection(), args.source, args.unit)
+    print(f"Removed {removed} cached buckets")
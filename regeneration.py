@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+from database import get_mongodb_connection, run_db
+from personality_processing import LLM_MODEL, PROMPT_VERSION, generate_personality_result
+from prompts import is_truncated
+from result_cache import build_result_cache
+
+# Assessments answered with the template fallback carry needs_regeneration:
+# true. regenerate_pending claims them one at a time (a lease, so several
+# workers never regenerate the same one), asks the LLM again (usually a
+# result cache hit, since the call that missed the deadline keeps running)
+# and swaps the text in, on the assessment and on the user's latest copy.
+# main.py runs it every REGENERATION_INTERVAL seconds while the LLM circuit
+# is closed; "python regeneration.py" runs one pass by hand. A regenerated
+# text that the token cap cut off again is stored but stays pending, for at
+# most REGENERATION_MAX_ATTEMPTS such passes.
+
+REGENERATION_LEASE = timedelta(seconds=int(os.getenv("REGENERATION_LEASE", "300")))
+REGENERATION_MAX_ATTEMPTS = int(os.getenv("REGENERATION_MAX_ATTEMPTS", "3"))
+
+
+def claim_pending(db, lease=REGENERATION_LEASE):
+    now = datetime.utcnow()
+    return db.assessments.find_one_and_update(
+        {
+            "needs_regeneration": True,
+            "$or": [
+                {"regeneration_claimed_at": {"$exists": False}},
+                {"regeneration_claimed_at": {"$lt": now - lease}}
+            ],
+            "$nor": [{"regeneration_attempts": {"$gte": REGENERATION_MAX_ATTEMPTS}}]
+        },
+        {"$set": {"regeneration_claimed_at": now}},
+        projection={"question_answers": 1, "user_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def apply_regeneration(db, assessment, personality_result, llm_usage):
+    """
+    Returns:
+        dict: the user document (name only) when the assessment was still
+        pending and the new text was stored, else None
+    """
+    update = {
+        "$set": {
+            "personality_result": personality_result,
+            "llm_usage": llm_usage,
+            "regenerated_at": datetime.utcnow()
+        },
+        "$unset": {"needs_regeneration": "", "regeneration_claimed_at": ""}
+    }
+    if is_truncated(llm_usage):
+        # Cut off again: replaces the old text but stays pending, retried
+        # once the claim's lease runs out
+        del update["$unset"]
+        update["$inc"] = {"regeneration_attempts": 1}
+    updated = db.assessments.update_one({"_id": assessment["_id"], "needs_regeneration": True}, update)
+    if not updated.modified_count:
+        return None
+    user_id = assessment["user_id"]
+    return db.users.find_one_and_update(
+        {
+            "_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id,
+            "latest_assessment.assessment_id": assessment["_id"]
+        },
+        {"$set": {"latest_assessment.personality_result": personality_result}},
+        projection={"name": 1}
+    ) or {"_id": user_id}
+
+
+def release_claim(db, assessment):
+    db.assessments.update_one({"_id": assessment["_id"]}, {"$unset": {"regeneration_claimed_at": ""}})
+
+
+async def regenerate_pending(db, api_key, cache=None, client=None, flight=None, limit=50):
+    """
+    Regenerate up to ``limit`` fallback assessments; stops at the first LLM
+    error so an unhealthy provider is not hammered
+
+    Returns:
+        list: user documents (``_id`` and ``name``) whose latest analysis changed
+    """
+    regenerated = []
+    for _ in range(limit):
+        assessment = await run_db(claim_pending, db)
+        if assessment is None:
+            break
+        usage = {}
+        try:
+            result = await generate_personality_result(
+                assessment["question_answers"], api_key, cache, client, flight, usage
+            )
+        except Exception as e:
+            print(f"Regeneration failed for assessment {assessment['_id']}: {e}")
+            await run_db(release_claim, db, assessment)
+            break
+        user = await run_db(apply_regeneration, db, assessment, result, usage)
+        if user is not None:
+            regenerated.append(user)
+    return regenerated
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Replace fallback analyses with LLM-generated ones")
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+    db = get_mongodb_connection()
+    users = asyncio.run(regenerate_pending(
+        db, os.getenv("MISTRAL_API_KEY"),
+        cache=build_result_cache(db, LLM_MODEL, PROMPT_VERSION),
+        limit=args.limit
+    ))
+    print(f"Regenerated {len(users)} assessments")
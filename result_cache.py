@@ -0,0 +1,188 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from database import run_db
+
+
+class LRUTTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after ``ttl`` seconds
+    """
+
+    def __init__(self, maxsize=4096, ttl=86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MongoResultStore:
+    """
+    Shared result tier: one document per answer key holding up to N variants
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_variants(self, key):
+        document = self.collection.find_one({"_id": key}, {"variants": 1})
+        return document.get("variants", []) if document else []
+
+    def add_variant(self, key, text, max_variants, metadata=None):
+        self.collection.update_one(
+            {"_id": key},
+            {
+                "$push": {"variants": {"$each": [text], "$slice": -max_variants}},
+                "$set": dict(metadata or {}, updated_at=datetime.utcnow())
+            },
+            upsert=True
+        )
+
+
+def normalize_answers(options):
+    return "".join(option.strip().upper() for option in options)
+
+
+def make_cache_key(options, model, prompt_version):
+    return f"{prompt_version}|{model}|{normalize_answers(options)}"
+
+
+class PersonalityResultCache:
+    """
+    Cache of generated personality analyses keyed by answers, model and prompt version.
+
+    Each key holds up to ``variants`` texts. Until a key has that many, lookups
+    miss so new generations fill it up; afterwards a random variant is served.
+    """
+
+    def __init__(self, model, prompt_version, memory=None, store=None, variants=1):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.memory = memory if memory is not None else LRUTTLCache()
+        self.store = store
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, options):
+        return make_cache_key(options, self.model, self.prompt_version)
+
+    async def get(self, options):
+        key = self.key(options)
+        cached = self.memory.get(key, [])
+        if len(cached) < self.variants and self.store is not None:
+            try:
+                stored = await run_db(self.store.get_variants, key)
+            except Exception as e:
+                print(f"Result cache read error: {e}")
+                stored = []
+            if len(stored) > len(cached):
+                cached = stored
+                self.memory.set(key, list(stored))
+
+        if len(cached) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(cached)
+
+    def warm(self, limit):
+        """
+        Load up to ``limit`` most recently updated keys from the store into memory
+
+        Returns:
+            int: number of keys loaded
+        """
+        if self.store is None or limit <= 0:
+            return 0
+        documents = self.store.collection.find(
+            {"model": self.model, "prompt_version": self.prompt_version},
+            {"variants": 1}
+        ).sort("updated_at", -1).limit(min(limit, self.memory.maxsize))
+        loaded = 0
+        for document in documents:
+            if document.get("variants"):
+                self.memory.set(document["_id"], list(document["variants"][-self.variants:]))
+                loaded += 1
+        return loaded
+
+    async def put(self, options, text):
+        key = self.key(options)
+        cached = self.memory.get(key, [])
+        self.memory.set(key, (cached + [text])[-self.variants:])
+        if self.store is not None:
+            try:
+                await run_db(
+                    self.store.add_variant, key, text, self.variants,
+                    {"model": self.model, "prompt_version": self.prompt_version,
+                     "answers": normalize_answers(options)}
+                )
+            except Exception as e:
+                print(f"Result cache write error: {e}")
+
+
+def build_result_cache(db, model, prompt_version):
+    """
+    Build the result cache from environment settings
+
+    Returns:
+        PersonalityResultCache or None when RESULT_CACHE_ENABLED is false
+    """
+    if os.getenv("RESULT_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    memory = LRUTTLCache(
+        maxsize=int(os.getenv("RESULT_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "86400"))
+    )
+    store = None
+    if os.getenv("RESULT_CACHE_MONGO", "false").lower() == "true":
+        store = MongoResultStore(db[os.getenv("RESULT_CACHE_COLLECTION", "personality_profiles")])
+
+    return PersonalityResultCache(
+        model,
+        prompt_version,
+        memory=memory,
+        store=store,
+        variants=int(os.getenv("RESULT_CACHE_VARIANTS", "1"))
+    )
@@ -0,0 +1,61 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. The entry is removed as soon as the
+    task finishes, so a failure is delivered to the callers that shared it
+    and the next call starts fresh (errors are never cached). Waiters are
+    shielded from each other: one caller being cancelled or timing out does
+    not cancel the shared work for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.shared_hits = 0
+        self.failures = 0
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "shared_hits": self.shared_hits,
+            "failures": self.failures,
+            "in_flight": len(self._calls)
+        }
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Retrieving the exception also silences "never retrieved" warnings
+            # when every waiter has gone away
+            self.failures += 1
+
+    async def do(self, key, func, *args, timeout=None, **kwargs):
+        """
+        Await ``func(*args, **kwargs)``, sharing one execution per ``key``
+
+        ``timeout`` bounds how long this caller waits; the shared work keeps
+        running for other waiters.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.shared_hits += 1
+
+        if timeout is None:
+            return await asyncio.shield(task)
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
@@ -0,0 +1,202 @@
+import argparse
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Trait scoring compiled from the nested personality_traits map into integer
+# lookup tables, so any number of answer vectors is scored with a few NumPy
+# operations instead of per-answer dict walks:
+#   primary_table[question, option]  -> primary id
+#   subtrait_table[question, option] -> subtrait id
+# Tie-break: when several primaries share the highest count, the one chosen
+# by the earliest question wins. This is what the original dict-based count
+# returned (insertion order), so dominant traits of stored assessments and
+# cached results keep their meaning.
+
+OPTIONS = "ABCD"
+# Stored with trait_scores; bump when the tables or tie-break change so a
+# backfill can find documents scored by an older engine
+SCORING_VERSION = 1
+
+
+class TraitScorer:
+    def __init__(self, personality_traits):
+        questions = sorted(personality_traits, key=int)
+        self.question_count = len(questions)
+        self.primaries = []
+        self.subtraits = []
+        self.primary_table = np.zeros((len(questions), len(OPTIONS)), dtype=np.int8)
+        self.subtrait_table = np.zeros((len(questions), len(OPTIONS)), dtype=np.int16)
+        for q, question in enumerate(questions):
+            for o, option in enumerate(OPTIONS):
+                trait = personality_traits[question][option]
+                if trait["primary"] not in self.primaries:
+                    self.primaries.append(trait["primary"])
+                self.subtraits.append(trait["subtrait"])
+                self.primary_table[q, o] = self.primaries.index(trait["primary"])
+                self.subtrait_table[q, o] = len(self.subtraits) - 1
+        self._option_codes = np.full(256, -1, dtype=np.int8)
+        for o, option in enumerate(OPTIONS):
+            self._option_codes[ord(option)] = o
+            self._option_codes[ord(option.lower())] = o
+
+    def encode(self, answer_sets):
+        """
+        Encode answer sets (strings like "ABCDAB" or lists of letters) as an
+        (n, questions) int8 matrix of option indexes
+
+        Raises:
+            ValueError: on a wrong answer count or an unknown option
+        """
+        rows = ["".join(answers) for answers in answer_sets]
+        if any(len(row) != self.question_count for row in rows):
+            raise ValueError(f"Exactly {self.question_count} options must be provided.")
+        raw = np.frombuffer("".join(rows).encode("latin-1", errors="replace"), dtype=np.uint8)
+        codes = self._option_codes[raw]
+        if (codes < 0).any():
+            raise ValueError(f"Options must be one of {', '.join(OPTIONS)}.")
+        return codes.reshape(len(answer_sets), self.question_count)
+
+    def is_valid(self, answers):
+        try:
+            row = "".join(answers)
+        except TypeError:
+            return False
+        return len(row) == self.question_count and all(option in OPTIONS for option in row.upper())
+
+    def score(self, encoded):
+        """
+        Score an encoded (n, questions) answer matrix
+
+        Returns:
+            dict: ``counts`` (n, primaries) int, ``dominant`` (n,) primary ids,
+            ``distribution`` (n, primaries) percent per primary and
+            ``subtraits`` (n, questions) subtrait ids
+        """
+        encoded = np.asarray(encoded, dtype=np.intp)
+        questions = np.arange(self.question_count)
+        primary_ids = self.primary_table[questions, encoded]
+        one_hot = primary_ids[:, :, None] == np.arange(len(self.primaries))
+        counts = one_hot.sum(axis=1)
+
+        # First question (0-based) each primary was chosen for; question_count
+        # when never chosen. Ranking by count, then by earliest question,
+        # gives the documented tie-break with a single argmax.
+        first_seen = np.where(one_hot.any(axis=1), one_hot.argmax(axis=1), self.question_count)
+        dominant = np.argmax(counts * (self.question_count + 1) + (self.question_count - first_seen), axis=1)
+
+        return {
+            "counts": counts,
+            "dominant": dominant,
+            "distribution": counts * (100.0 / self.question_count),
+            "subtraits": self.subtrait_table[questions, encoded]
+        }
+
+    def score_answers(self, selected_options):
+        """
+        Score one answer set
+
+        Returns:
+            dict: dominant_trait, trait_counts, trait_distribution and subtraits
+        """
+        scores = self.score(self.encode([selected_options]))
+        return self.describe(scores, 0)
+
+    def describe(self, scores, row):
+        return {
+            "dominant_trait": self.primaries[scores["dominant"][row]],
+            "trait_counts": {
+                primary: int(count) for primary, count in zip(self.primaries, scores["counts"][row])
+            },
+            "trait_distribution": {
+                primary: round(float(percent), 2)
+                for primary, percent in zip(self.primaries, scores["distribution"][row])
+            },
+            "subtraits": [self.subtraits[subtrait] for subtrait in scores["subtraits"][row]]
+        }
+
+    def document_fields(self, scores, row):
+        """
+        Fields stored on an assessment document for row ``row`` of ``scores``
+        """
+        described = self.describe(scores, row)
+        return {
+            "dominant_trait": described["dominant_trait"],
+            "trait_scores": {
+                "counts": described["trait_counts"],
+                "distribution": described["trait_distribution"],
+                "subtraits": described["subtraits"],
+                "version": SCORING_VERSION
+            }
+        }
+
+
+def iter_assessment_scores(db, scorer, batch_size=10000, query=None):
+    """
+    Stream ``db.assessments`` in batches and score each batch at once.
+    Assessments whose answers cannot be scored are skipped.
+
+    Yields:
+        tuple: (list of assessment _ids, scores dict from TraitScorer.score)
+    """
+    cursor = db.assessments.find(query or {}, {"question_answers": 1}, batch_size=batch_size)
+    ids, answers = [], []
+
+    def flush():
+        scores = scorer.score(scorer.encode(answers))
+        return list(ids), scores
+
+    for document in cursor:
+        if not scorer.is_valid(document.get("question_answers") or []):
+            continue
+        ids.append(document["_id"])
+        answers.append(document["question_answers"])
+        if len(ids) >= batch_size:
+            yield flush()
+            ids, answers = [], []
+    if ids:
+        yield flush()
+
+
+def summarize_assessments(db, scorer, batch_size=10000):
+    """
+    Re-score every stored assessment
+
+    Returns:
+        dict: assessment count, dominant trait counts and mean distribution
+    """
+    total = 0
+    dominant_counts = np.zeros(len(scorer.primaries), dtype=np.int64)
+    distribution_sum = np.zeros(len(scorer.primaries))
+    for ids, scores in iter_assessment_scores(db, scorer, batch_size):
+        total += len(ids)
+        dominant_counts += np.bincount(scores["dominant"], minlength=len(scorer.primaries))
+        distribution_sum += scores["distribution"].sum(axis=0)
+    return {
+        "assessments": total,
+        "dominant_traits": {
+            primary: int(count) for primary, count in zip(scorer.primaries, dominant_counts)
+        },
+        "mean_distribution": {
+            primary: round(float(value / total), 2) if total else 0.0
+            for primary, value in zip(scorer.primaries, distribution_sum)
+        }
+    }
+
+
+if __name__ == "__main__":
+    from database import get_mongodb_connection
+    from personality_processing import TRAIT_SCORER
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Re-score all stored assessments")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = summarize_assessments(get_mongodb_connection(), TRAIT_SCORER, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Scored {summary['assessments']} assessments in {elapsed:.2f}s")
+    for primary, count in summary["dominant_traits"].items():
+        print(f"{primary:<12} dominant {count:>8}  mean share {summary['mean_distribution'][primary]:>6}%")
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from write_behind import DUPLICATE_KEY_ERROR
+
+
+def user_key(name, user_type):
+    return (name, user_type)
+
+
+def upsert_user(db, name, user_type, roll_number):
+    """
+    Find or create the user for (name, user_type) in one atomic round trip.
+    Relies on the unique users(name, user_type) index from indexes.py.
+
+    Returns:
+        tuple: (user_id, created document or None when the user already existed)
+    """
+    document = {"_id": ObjectId(), "roll_number": roll_number, "created_at": datetime.utcnow()}
+    for attempt in range(2):
+        try:
+            existing = db.users.find_one_and_update(
+                {"name": name, "user_type": user_type},
+                {"$setOnInsert": document},
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            break
+        except DuplicateKeyError:
+            # Two upserts raced to insert; the retry matches the winner
+            if attempt:
+                raise
+    if existing is not None:
+        return str(existing["_id"]), None
+    return str(document["_id"]), dict(document, name=name, user_type=user_type)
+
+
+def resolve_user_ids_bulk(db, users):
+    """
+    Resolve many (name, user_type, roll_number) tuples to user ids with one
+    ``$in`` lookup, upserting the missing users in a single bulk_write
+
+    Returns:
+        tuple: ({(name, user_type): user_id}, [newly created user documents])
+    """
+    wanted = {}
+    for name, user_type, roll_number in users:
+        wanted.setdefault(user_key(name, user_type), roll_number)
+
+    def lookup():
+        names = list({name for name, _ in wanted})
+        found = {}
+        for user in db.users.find({"name": {"$in": names}}, {"name": 1, "user_type": 1}):
+            key = user_key(user["name"], user.get("user_type"))
+            if key in wanted:
+                found[key] = str(user["_id"])
+        return found
+
+    user_ids = lookup()
+    missing = [key for key in wanted if key not in user_ids]
+    if not missing:
+        return user_ids, []
+
+    now = datetime.utcnow()
+    new_users = {
+        key: {"name": key[0], "user_type": key[1], "roll_number": wanted[key], "created_at": now}
+        for key in missing
+    }
+    operations = [
+        UpdateOne(
+            {"name": key[0], "user_type": key[1]},
+            {"$setOnInsert": {"roll_number": document["roll_number"], "created_at": now}},
+            upsert=True
+        )
+        for key, document in new_users.items()
+    ]
+    try:
+        result = db.users.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # Concurrent writers created some users first (unique index); the
+        # re-read below picks those up. Anything else is a real failure.
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+            raise
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+    created = []
+    for index, user_id in upserted.items():
+        key = missing[index]
+        user_ids[key] = str(user_id)
+        created.append(dict(new_users[key], _id=user_id))
+
+    if len(user_ids) < len(wanted):
+        user_ids.update(lookup())
+    return user_ids, created
@@ -0,0 +1,289 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from database import run_db
+
+# Optional write-behind mode (WRITE_BEHIND_ENABLED=true): request handlers
+# append records to a bounded in-process queue and return immediately; a
+# background task coalesces them into insert_many calls. Every record is
+# first appended to a local spill log so a crash loses nothing: on startup
+# the log is replayed, and it is truncated whenever the queue fully drains.
+# Spill lines are group-committed: records enqueued while a write is in
+# progress go out together in the next single write (and fsync), run in the
+# DB executor rather than on the event loop. Records carry their _id from
+# enqueue time, so replays are idempotent. Each collection of a flushed
+# batch is post-processed (on_flushed) as soon as its insert succeeds; only
+# the records that failed are queued again.
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class WriteBehindQueue:
+    def __init__(self, get_db, maxsize=10000, batch_size=500, flush_interval=0.05,
+                 spill_path="write_behind.log", fsync=False, on_flushed=None):
+        self.get_db = get_db
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.fsync = fsync
+        self.on_flushed = on_flushed
+        self._pending = deque()
+        self._has_items = asyncio.Event()
+        self._in_flight = 0
+        self._spill = None
+        # Records waiting for the next group commit to the spill log
+        self._spill_buffer = []
+        self._spill_committed = None
+        self._spill_lock = asyncio.Lock()
+        self._spill_writes = set()
+        self._task = None
+        self._closing = False
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.flush_failures = 0
+        self.last_flush_lag = 0.0
+
+    @classmethod
+    def from_env(cls, get_db, on_flushed=None):
+        return cls(
+            get_db,
+            maxsize=int(os.getenv("WRITE_BEHIND_MAXSIZE", "10000")),
+            batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05")),
+            spill_path=os.getenv("WRITE_BEHIND_SPILL_PATH", "write_behind.log"),
+            fsync=os.getenv("WRITE_BEHIND_FSYNC", "false").lower() == "true",
+            on_flushed=on_flushed
+        )
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    @property
+    def lag(self):
+        """Seconds the oldest unflushed record has been waiting"""
+        return time.monotonic() - self._pending[0][0] if self._pending else 0.0
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "in_flight": self._in_flight,
+            "lag_seconds": round(self.lag, 4),
+            "last_flush_lag_seconds": round(self.last_flush_lag, 4),
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "flush_failures": self.flush_failures
+        }
+
+    async def start(self):
+        await self.replay()
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+        self._task = asyncio.create_task(self._drain_loop())
+
+    async def enqueue(self, collection_name, document):
+        """
+        Queue ``document`` for insertion into ``collection_name`` once its
+        spill line is written
+
+        Returns:
+            bool: False when the queue is full or closing, or the spill write
+            failed; the caller should then write synchronously
+        """
+        if self._closing or self._spill is None or \
+                len(self._pending) + len(self._spill_buffer) >= self.maxsize:
+            return False
+        document.setdefault("_id", ObjectId())
+        self._spill_buffer.append((time.monotonic(), collection_name, document))
+        if self._spill_committed is None:
+            self._spill_committed = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(self._commit_spill())
+            self._spill_writes.add(task)
+            task.add_done_callback(self._spill_writes.discard)
+        return await asyncio.shield(self._spill_committed)
+
+    async def _commit_spill(self):
+        async with self._spill_lock:
+            # Everything buffered while the previous write ran goes out now
+            entries, self._spill_buffer = self._spill_buffer, []
+            committed, self._spill_committed = self._spill_committed, None
+            lines = "".join(json_util.dumps({"c": name, "d": document}) + "\n" for _, name, document in entries)
+            try:
+                await run_db(self._write_spill, lines)
+            except Exception as e:
+                print(f"Write-behind spill error: {e}")
+                committed.set_result(False)
+                return
+            self._pending.extend(entries)
+            self.enqueued_total += len(entries)
+            self._has_items.set()
+            committed.set_result(True)
+
+    def _write_spill(self, lines):
+        self._spill.write(lines)
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+
+    async def _drain_loop(self):
+        while not (self._closing and not self._pending):
+            if not self._pending:
+                self._has_items.clear()
+                await self._has_items.wait()
+                # Let a burst accumulate so it coalesces into one insert_many
+                await asyncio.sleep(self.flush_interval)
+            if not await self.flush_once() and self._closing:
+                # Database unavailable at shutdown: the spill log keeps the
+                # remaining records for replay by the next process
+                break
+
+    async def flush_once(self):
+        """
+        Insert up to ``batch_size`` queued records
+
+        Returns:
+            bool: False when the write failed and the records were re-queued
+        """
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return True
+        self._in_flight = len(batch)
+        by_collection = {}
+        for entry in batch:
+            by_collection.setdefault(entry[1], []).append(entry)
+        retry = []
+        for collection_name, entries in by_collection.items():
+            try:
+                stored, failed = await run_db(
+                    insert_stored, self.get_db()[collection_name], [document for _, _, document in entries]
+                )
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+                stored, failed = [], [document for _, _, document in entries]
+            if failed:
+                failed_ids = {document["_id"] for document in failed}
+                retry.extend(entry for entry in entries if entry[2]["_id"] in failed_ids)
+            if stored:
+                self.flushed_total += len(stored)
+                await self._after_insert({collection_name: stored})
+        self._in_flight = 0
+
+        if retry:
+            # Keep the failed records (and their spill lines) and retry after a pause
+            self.flush_failures += 1
+            self._pending.extendleft(reversed(retry))
+            if not self._closing:
+                await asyncio.sleep(min(5.0, 0.1 * 2 ** min(self.flush_failures, 6)))
+            return False
+
+        self.flush_failures = 0
+        self.last_flush_lag = time.monotonic() - batch[0][0]
+        if not self._pending:
+            await self._truncate_spill()
+        return True
+
+    async def _after_insert(self, inserted):
+        if self.on_flushed is None:
+            return
+        for collection_name, documents in inserted.items():
+            if not documents:
+                continue
+            try:
+                await self.on_flushed(collection_name, documents)
+            except Exception as e:
+                print(f"Write-behind post-flush error: {e}")
+
+    async def _truncate_spill(self):
+        async with self._spill_lock:
+            # Records may have been spilled while we waited for the lock
+            if self._spill is not None and not self._pending and not self._spill_buffer:
+                await run_db(self._spill.truncate, 0)
+
+    async def replay(self):
+        """
+        Re-insert records left in the spill log by a previous process
+
+        Returns:
+            int: number of records replayed
+        """
+        if not os.path.exists(self.spill_path):
+            return 0
+        by_collection = {}
+        with open(self.spill_path, encoding="utf-8") as spill:
+            for line in spill:
+                try:
+                    entry = json_util.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    continue
+                by_collection.setdefault(entry["c"], []).append(entry["d"])
+        replayed = 0
+        inserted = {}
+        for collection_name, documents in by_collection.items():
+            inserted[collection_name] = await run_db(
+                insert_idempotent, self.get_db()[collection_name], documents
+            )
+            replayed += len(inserted[collection_name])
+        await self._after_insert(inserted)
+        os.remove(self.spill_path)
+        if replayed:
+            print(f"Write-behind replayed {replayed} records from {self.spill_path}")
+        return replayed
+
+    async def close(self):
+        """
+        Stop accepting records and flush everything still queued
+        """
+        self._closing = True
+        # Spill writes still in progress hand their records to the queue first
+        await asyncio.gather(*self._spill_writes)
+        self._has_items.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._spill is not None:
+            await self._truncate_spill()
+            self._spill.close()
+            self._spill = None
+
+
+def insert_stored(collection, documents):
+    """
+    insert_many for queued records. Their _ids are assigned at enqueue time,
+    so a duplicate means an earlier, failed-looking attempt of this process
+    did write it; it counts as stored (and still needs post-processing).
+
+    Returns:
+        tuple: (documents now stored, documents that failed)
+    """
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])
+                  if error.get("code") != DUPLICATE_KEY_ERROR}
+        return ([document for index, document in enumerate(documents) if index not in failed],
+                [documents[index] for index in sorted(failed)])
+    return documents, []
+
+
+def insert_idempotent(collection, documents):
+    """
+    insert_many that treats duplicate _ids as already written (e.g. on replay)
+
+    Returns:
+        list: the documents that were newly inserted
+    """
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        return [document for index, document in enumerate(documents) if index not in duplicates]
+    return documents